@@ -1,3 +1,4 @@
+import io
 import os
 import re
 import csv
@@ -5,11 +6,23 @@ import sys
 import time
 import uuid
 import json
+import shutil
+import struct
+import zlib
+import hashlib
+import hmac
+import secrets
+import tempfile
 import numpy as np
 import calendar
 import threading
+import ast
+from functools import lru_cache
 from pathlib import Path
 from threading import Lock
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from datetime import date, datetime
 
 # Resolve ADAS root from __file__: main.py -> ADAS Agent -> core -> ADAS
@@ -18,6 +31,10 @@ if _ADAS_ROOT not in sys.path:
     sys.path.insert(0, _ADAS_ROOT)
 
 import pandas as pd
+try:
+    import pyarrow.dataset as pa_ds  # optional: Parquet / Feather source tables
+except Exception:
+    pa_ds = None
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from core.utils import *
@@ -38,7 +55,20 @@ DATA_DICT = {}  # CSV Data Table Files
 DATA_DICT_LOCK = Lock() # for atomic swap
 VPS_DICT_LOCK = Lock()
 BASE_DICT_LOCK = Lock()
-DATA_DICT_LOAD_ORDER = []  # Track load order for oldest removal
+DATA_DICT_LRU = OrderedDict()  # table key -> bytes, least recently used first
+DEFAULT_TABLE_CACHE_BYTES = 8 * 1024**3
+TABLE_LOADS = {}  # In-flight table loads, keyed like DATA_DICT (guarded by DATA_DICT_LOCK)
+CUBE_DICT = {}  # Pre-aggregated loss cubes, keyed like DATA_DICT
+CUBE_DICT_LOCK = Lock()
+TABLE_APPEND_STATE = {}  # Where each table's last parse ended, keyed like DATA_DICT (guarded by DATA_DICT_LOCK)
+TABLE_HEADERS = {}  # All column names of each table's source file, keyed like DATA_DICT (guarded by DATA_DICT_LOCK)
+TABLE_STATS = {}  # File version (mtime_ns, size) each loaded table was read at, keyed like DATA_DICT (guarded by DATA_DICT_LOCK)
+TABLE_SCANS = {}  # Columnar tables read per request instead of kept resident: key -> path (guarded by DATA_DICT_LOCK)
+COLUMNAR_TABLES = {}  # Format / pyarrow dataset of each columnar source table at a ChangeTracker version, keyed like DATA_DICT
+COLUMNAR_TABLES_LOCK = Lock()
+DEFAULT_SCAN_TABLE_BYTES = 1024**3
+COLUMNAR_FORMATS = {'.parquet': 'parquet', '.pq': 'parquet', '.feather': 'feather', '.arrow': 'feather'}
+APPEND_CHECK_BYTES = 1024**2  # block size of the prefix checksum read before rows are appended
 
 # Global date range configuration - loaded from project-specific JSON files
 # Priority: 1) JSON file, 2) Data-derived values, 3) These hardcoded defaults (last resort)
@@ -48,6 +78,12 @@ DEFAULT_DEV_END = 202601
 
 # Cache for project-specific settings to avoid repeated file reads
 PROJECT_SETTINGS_CACHE = {}
+PROJECT_SETTINGS_VERSION = {}
+
+# Memoized ADASTri/ADASVec/ADASHeaders results (LRU)
+RESULT_CACHE = OrderedDict()
+RESULT_CACHE_LOCK = Lock()
+RESULT_CACHE_STATS = {'hits': 0, 'misses': 0}
 
 
 def remove_old_instances():
@@ -139,7 +175,7 @@ def _parse_date_to_yyyymm(date_str):
 def _load_project_settings(project_name, df=None, date_cols=None):
     """
     Load project-specific settings from general_settings.json.
-    Uses cache to avoid repeated file reads.
+    Uses cache to avoid repeated file reads; the cache is dropped when the file changes.
 
     Args:
         project_name: Name of the project
@@ -149,12 +185,13 @@ def _load_project_settings(project_name, df=None, date_cols=None):
     Returns:
         Dictionary with keys: origin_start, origin_end, dev_end (all in YYYYMM format)
     """
-    # Check cache first
-    if project_name in PROJECT_SETTINGS_CACHE:
-        return PROJECT_SETTINGS_CACHE[project_name]
-
     # Build path to project settings file
     settings_path = PROJECT_ROOT / "projects" / project_name / "general_settings.json"
+    settings_version = CHANGE_TRACKER.version(settings_path)
+
+    # Check cache first
+    if project_name in PROJECT_SETTINGS_CACHE and PROJECT_SETTINGS_VERSION.get(project_name) == settings_version:
+        return PROJECT_SETTINGS_CACHE[project_name]
 
     settings = None
 
@@ -178,14 +215,29 @@ def _load_project_settings(project_name, df=None, date_cols=None):
         print(f"Error loading JSON settings for [{project_name}]: {e}")
         settings = None
 
+    # A scanned columnar table only has a sample row in DATA_DICT: its dates come from the dataset
+    scan_path = None
+    if df is not None and date_cols is not None:
+        with DATA_DICT_LOCK:
+            scan_path = TABLE_SCANS.get(_table_key(_table_path(project_name)))
+    scanned_min = None
+
     # If JSON not found or failed, try to derive from data
     if settings is None and df is not None and date_cols is not None:
         try:
-            settings = {
-                'origin_start': int(df[date_cols[0]].min()),
-                'origin_end': int(df[date_cols[0]].max()),
-                'dev_end': int(df[date_cols[1]].max())
-            }
+            if scan_path is not None:
+                scanned_min, scanned_max = _columnar_min_max(scan_path, date_cols[:2])
+                settings = {
+                    'origin_start': int(scanned_min[date_cols[0]]),
+                    'origin_end': int(scanned_max[date_cols[0]]),
+                    'dev_end': int(scanned_max[date_cols[1]])
+                }
+            else:
+                settings = {
+                    'origin_start': int(df[date_cols[0]].min()),
+                    'origin_end': int(df[date_cols[0]].max()),
+                    'dev_end': int(df[date_cols[1]].max())
+                }
             print(f"Derived settings from data for [{project_name}]: origin {settings['origin_start']}-{settings['origin_end']}, dev_end {settings['dev_end']}")
         except Exception as e:
             print(f"Error deriving settings from data for [{project_name}]: {e}")
@@ -203,7 +255,12 @@ def _load_project_settings(project_name, df=None, date_cols=None):
     # Detect date granularity from actual data column
     if df is not None and date_cols is not None:
         try:
-            sample_val = int(df[date_cols[0]].dropna().iloc[0])
+            if scan_path is not None:
+                if scanned_min is None:
+                    scanned_min = _columnar_min_max(scan_path, date_cols[:1])[0]
+                sample_val = int(scanned_min[date_cols[0]])
+            else:
+                sample_val = int(df[date_cols[0]].dropna().iloc[0])
             settings['date_granularity'] = 'annual' if len(str(sample_val)) == 4 else 'monthly'
         except Exception:
             settings['date_granularity'] = 'monthly'
@@ -212,6 +269,7 @@ def _load_project_settings(project_name, df=None, date_cols=None):
 
     # Cache the settings
     PROJECT_SETTINGS_CACHE[project_name] = settings
+    PROJECT_SETTINGS_VERSION[project_name] = settings_version
 
     return settings
 
@@ -263,27 +321,265 @@ def _generate_period_range(start_yrmo, end_yrmo, date_granularity='monthly'):
     return _generate_full_month_range(start_yrmo, end_yrmo)
 
 
-def _enforce_data_dict_limit(max_tables=10):
+def _table_key(table_path):
+    """
+    DATA_DICT / CUBE_DICT key of a source table: its resolved, normalized path. Projects that
+    reach the same table through different paths share one loaded copy, and tables that only
+    share a file name are never confused. Resolved on every call (not cached): a symlink or
+    junction re-pointed to a new extract must key the new target.
+    """
+    return os.path.normcase(os.path.realpath(table_path))
+
+
+def _hash_source(table_path):
+    # SHA-1 of a source table's content (of every file, by relative name, for a partitioned folder)
+    folder = os.path.isdir(table_path)
+    files = [table_path]
+    if folder:
+        files = sorted(os.path.join(root, name) for root, _, names in os.walk(table_path) for name in names)
+
+    digest = hashlib.sha1()
+    for path in files:
+        if folder:
+            digest.update(os.path.relpath(path, table_path).encode('utf-8'))
+        with open(path, mode='rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _table_identity(table_path, version, digest=None):
+    """
+    Content identity of a source table read at file version (mtime_ns, size): the version itself,
+    or with apps.agent.table_hash (size, content SHA-1), so a table re-published with the same
+    content keeps its loaded copy and cached results. digest: the SHA-1 already taken over the
+    bytes that were read (see _ChecksumReader), instead of reading the file again.
+    The version is re-checked afterwards: if the file changed, the version itself is returned
+    (not content-verified).
+    """
+    if version is None or not get_config_value('apps.agent.table_hash', False):
+        return version
+    digest = digest or _hash_source(table_path)
+    if ChangeTracker._stat_version(table_path) != version:
+        return version
+    return (version[1], digest)
+
+
+def _pinned_table_keys():
+    pinned_projects = get_config_value('apps.agent.pinned_projects', []) or []
+    if 'Table Paths' not in BASE_DICT:
+        return set()
+    return {_table_key(_table_path(p)) for p in pinned_projects}
+
+
+def _touch_table(key):
     """
-    Enforce the max table limit in DATA_DICT.
-    Remove the oldest table if count >= max_tables before adding a new one.
-    Should be called BEFORE adding a new table while holding DATA_DICT_LOCK.
+    Mark a table as most recently used. Should be called while holding DATA_DICT_LOCK.
     """
-    # Count actual dataframes (exclude " - Version" entries)
-    table_count = sum(1 for key in DATA_DICT.keys() if not key.endswith(" - Version"))
+    if key in DATA_DICT_LRU:
+        DATA_DICT_LRU.move_to_end(key)
+
 
-    if table_count >= max_tables:
-        # Find oldest table from load order
-        if DATA_DICT_LOAD_ORDER:
-            oldest_table = DATA_DICT_LOAD_ORDER.pop(0)
-            if oldest_table in DATA_DICT:
-                del DATA_DICT[oldest_table]
-            if oldest_table + " - Version" in DATA_DICT:
-                del DATA_DICT[oldest_table + " - Version"]
-            print(f"Removed oldest table from cache: {oldest_table}")
+def _remove_table(key):
+    DATA_DICT.pop(key, None)
+    DATA_DICT.pop(key + " - Version", None)
+    DATA_DICT_LRU.pop(key, None)
+    TABLE_APPEND_STATE.pop(key, None)
+    TABLE_HEADERS.pop(key, None)
+    TABLE_SCANS.pop(key, None)
+    TABLE_STATS.pop(key, None)
+    with CUBE_DICT_LOCK:
+        CUBE_DICT.pop(key, None)
+    with COLUMNAR_TABLES_LOCK:
+        COLUMNAR_TABLES.pop(key, None)
+
+
+def _enforce_data_dict_budget(keep=None):
+    """
+    Evict least recently used tables until DATA_DICT fits in apps.agent.table_cache_bytes.
+    Tables of apps.agent.pinned_projects and the table just loaded (keep) are never evicted.
+    Should be called AFTER adding a new table while holding DATA_DICT_LOCK.
+    """
+    budget = get_config_value('apps.agent.table_cache_bytes', DEFAULT_TABLE_CACHE_BYTES)
+    protected = _pinned_table_keys() | {keep}
+
+    for key in list(DATA_DICT_LRU):
+        if sum(DATA_DICT_LRU.values()) <= budget:
+            break
+        if key in protected:
+            continue
+        size_mb = DATA_DICT_LRU[key] / 1024**2
+        _remove_table(key)
+        print(f"Removed least recently used table from cache: {key} ({size_mb:,.1f} MB)")
+
+
+def _is_mapped(values):
+    # Whether an array's memory is a memory map (np.load mmap_mode), directly or through views
+    while isinstance(values, np.ndarray):
+        if isinstance(values, np.memmap):
+            return True
+        values = values.base
+    return False
+
+
+def _table_bytes(df):
+    """
+    Private memory of a table, as counted against apps.agent.table_cache_bytes. Columns
+    mapped from a table image are shared page cache and not counted (of a mapped
+    categorical, only its categories are).
+    """
+    total = int(df.index.memory_usage(deep=True))
+    for col in df.columns:
+        series = df[col]
+        size = int(series.memory_usage(index=False, deep=True))
+        values = series.array.codes if isinstance(series.dtype, pd.CategoricalDtype) else series.to_numpy()
+        if _is_mapped(values):
+            size -= values.nbytes
+        total += size
+    return total
+
+
+def _add_table(key, df, version, identity):
+    """
+    Publish a table loaded at file version, with content identity (see _table_identity), and
+    enforce the memory budget. Should be called while holding DATA_DICT_LOCK.
+    The table version is (content identity, loaded columns), so it also changes when
+    columns are added to a column-projected table. Returns it.
+    """
+    DATA_DICT[key] = df
+    DATA_DICT[key + " - Version"] = table_version = (identity, tuple(df.columns))
+    TABLE_STATS[key] = version
+    DATA_DICT_LRU[key] = _table_bytes(df)
+    DATA_DICT_LRU.move_to_end(key)
+    _enforce_data_dict_budget(keep=key)
+    return table_version
+
+
+def _missing_columns(key, columns=None):
+    """
+    Columns of the source file that a request reads (columns; None = all of them) but the
+    loaded table does not have yet. Should be called while holding DATA_DICT_LOCK.
+    """
+    header = TABLE_HEADERS.get(key)
+    if header is None:
+        return []
+    loaded = set(DATA_DICT[key].columns)
+    return [c for c in header if c not in loaded and (columns is None or c in columns)]
+
+
+class ChangeTracker(FileSystemEventHandler):
+    """
+    In-memory version stamps of the files the agent depends on (project map, VPS JSON files,
+    general_settings.json, config.json, source tables). A file's version is its
+    (mtime_ns, size), or None while it does not exist. A folder (a partitioned source table)
+    is versioned by every file under it: (latest mtime_ns, total size, checksum of each
+    file's relative path, mtime_ns and size), since rewriting a file inside a partition
+    changes neither the folder's mtime nor its size.
+
+    Versions are refreshed by watchdog events on the files' folders (recursively for a
+    tracked folder), and by poll(), a plain
+    os.stat sweep run from the monitoring loop for shares that drop events. Requests only
+    read versions from memory; a file is stat'ed once, when it is first asked for.
+    """
+    def __init__(self):
+        super().__init__()
+        self.lock = Lock()
+        self.versions = {}        # normalized path -> version
+        self.tracked_trees = set()  # tracked folders, refreshed on any change below them
+        self.watched_dirs = set()   # (folder, recursive)
+        self.observer = Observer()
+
+    @staticmethod
+    def _norm(path):
+        return os.path.normcase(os.path.abspath(str(path)))
+
+    @staticmethod
+    def _stat_version(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not os.path.isdir(path):
+            return (st.st_mtime_ns, st.st_size)
+
+        latest, total, checksum = 0, 0, 0
+        for root, _, names in sorted(os.walk(path)):
+            for name in sorted(names):
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except OSError:  # removed during the walk
+                    continue
+                rel = os.path.relpath(os.path.join(root, name), path)
+                checksum = zlib.crc32(f"{rel}|{st.st_mtime_ns}|{st.st_size}\n".encode("utf-8"), checksum)
+                latest, total = max(latest, st.st_mtime_ns), total + st.st_size
+        return (latest, total, checksum)
+
+    def start(self):
+        self.observer.start()
+
+    def stop(self):
+        self.observer.stop()
+
+    def version(self, path):
+        key = self._norm(path)
+        with self.lock:
+            if key in self.versions:
+                return self.versions[key]
+
+        version = self._stat_version(key)
+        with self.lock:
+            version = self.versions.setdefault(key, version)
+        self._watch_dir(os.path.dirname(key))
+        if os.path.isdir(key):
+            with self.lock:
+                self.tracked_trees.add(key)
+            self._watch_dir(key, recursive=True)
+        return version
+
+    def _watch_dir(self, folder, recursive=False):
+        with self.lock:
+            if (folder, recursive) in self.watched_dirs:
+                return
+            self.watched_dirs.add((folder, recursive))
+        try:
+            self.observer.schedule(self, folder, recursive=recursive)
+        except Exception as e:  # missing or unwatchable folder: poll() still covers it
+            print(f"Change tracking falls back to polling for [{folder}]: {e}")
+
+    def refresh(self, path):
+        key = self._norm(path)
+        with self.lock:
+            if key not in self.versions:
+                return
+        version = self._stat_version(key)
+        with self.lock:
+            self.versions[key] = version
+
+    def poll(self):
+        with self.lock:
+            paths = list(self.versions)
+        for path in paths:
+            self.refresh(path)
+
+    def on_any_event(self, event):
+        for path in (event.src_path, getattr(event, 'dest_path', '')):
+            if not path:
+                continue
+            path = self._norm(path)
+            with self.lock:
+                trees = [tree for tree in self.tracked_trees if path.startswith(tree + os.sep)]
+            for tree in trees:
+                self.refresh(tree)
+            if not event.is_directory:
+                self.refresh(path)
+
+
+CHANGE_TRACKER = ChangeTracker()
+track_config_version(lambda: CHANGE_TRACKER.version(CONFIG_PATH))
 
 
 def load_BASE_DICT():
+    version = CHANGE_TRACKER.version(project_map_path)  # taken before the read
     with open(project_map_path, mode="r", encoding="utf-8") as f:
         project_mapping = json.load(f)
 
@@ -300,7 +596,19 @@ def load_BASE_DICT():
         team_profile_df = pd.DataFrame(virtual_projects)
 
     BASE_DICT['Project Map'] = team_profile_df.fillna('')
-    BASE_DICT['Project Map - Version'] = datetime.now()
+    # Project Name -> Table Path (first row wins, like DLOOKUP)
+    table_paths = {}
+    for project_name, table_path in zip(BASE_DICT['Project Map']['Project Name'], BASE_DICT['Project Map']['Table Path']):
+        table_paths.setdefault(project_name, table_path)
+    BASE_DICT['Table Paths'] = table_paths
+    BASE_DICT['Project Map - Version'] = version
+
+
+def _table_path(project_name):
+    """
+    Table Path of a project from the Project Map ('' if the project is not listed).
+    """
+    return BASE_DICT['Table Paths'].get(project_name, '')
 
 
 def DLOOKUP(df, lookup_value, lookup_col, return_col):
@@ -358,38 +666,987 @@ def _source_table_df_from_json(json_obj):
     return pd.DataFrame(normalized_rows, columns=["Column Name", "Significances", "Level"]).fillna('')
 
 
-def _get_vps_last_modified_time(project_name):
+def _get_vps_version(project_name):
     json_paths = _project_json_paths(project_name)
-    missing = [str(path) for path in json_paths.values() if not path.exists()]
+    versions = {name: CHANGE_TRACKER.version(path) for name, path in json_paths.items()}
+    missing = [str(json_paths[name]) for name, version in versions.items() if version is None]
     if missing:
         raise FileNotFoundError(f"Missing project JSON file(s): {', '.join(missing)}")
-    return max(datetime.fromtimestamp(path.stat().st_mtime) for path in json_paths.values())
+    return tuple(versions[name] for name in json_paths)
 
 
 def load_to_VPS_DICT(project_name, settings_file=None):
     json_paths = _project_json_paths(project_name)
     print(f"Loading JSON settings for [{project_name}] @ {get_current_time()}")
+    version = _get_vps_version(project_name)  # taken before the read
 
     source_table_json = _read_json(json_paths["source_table"])
     dataset_types_json = _read_json(json_paths["dataset_types"])
     reserving_class_types_json = _read_json(json_paths["reserving_class_types"])
 
-    VPS_DICT[project_name] = {}
-    VPS_DICT[project_name]["Source Table"] = _source_table_df_from_json(source_table_json)
-    VPS_DICT[project_name]["Dataset Types"] = _json_table_to_df(dataset_types_json)
-    VPS_DICT[project_name]["Reserving Class Types"] = _json_table_to_df(reserving_class_types_json)
-    VPS_DICT[project_name + " - Version"] = _get_vps_last_modified_time(project_name)
+    vps = {}
+    vps["Source Table"] = _source_table_df_from_json(source_table_json)
+    vps["Dataset Types"] = _json_table_to_df(dataset_types_json)
+    vps["Reserving Class Types"] = _json_table_to_df(reserving_class_types_json)
+    vps["Index"] = _VPSIndex(vps["Source Table"], vps["Dataset Types"], vps["Reserving Class Types"])
+    VPS_DICT[project_name] = vps
+    VPS_DICT[project_name + " - Version"] = version
+
+
+def _vps_index(project_name):
+    return VPS_DICT[project_name]["Index"]
+
+
+class _VPSIndex:
+    """
+    Dictionary indexes over one version of a project's VPS tables, built once when they are loaded.
+    Formulas are parsed here, and each reserving class Path is resolved once and then reused,
+    so request metadata costs a few dictionary lookups instead of DataFrame scans.
+    """
+    def __init__(self, source_table, dataset_types, rsv_cls_types):
+        # Source Table: date columns and reserving class columns (in level order)
+        columns = {}
+        for significance, column in zip(source_table['Significances'], source_table['Column Name']):
+            columns.setdefault(significance, []).append(column)
+        self.date_cols = (columns.get('Origin Date', [''])[0], columns.get('Development Date', [''])[0])
+        self.rsv_cls_col_names = list(dict.fromkeys(columns.get('Reserving Class', [])))
+
+        # Dataset Types: Name -> (Source, Data Format, dataset names in Source); Source -> Data Format
+        self.datasets = {}
+        self.source_formats = {}
+        data_formats = dataset_types.get('Data Format', [''] * len(dataset_types))  # optional column; '' = not given
+        for name, source, data_format in zip(dataset_types['Name'], dataset_types['Source'], data_formats):
+            self.datasets.setdefault(name, (source, data_format, split_formula(str(source))))
+            self.source_formats.setdefault(source, data_format)
+        # Every table column a Source formula reads
+        self.dataset_cols = tuple(dict.fromkeys(c for _, _, names in self.datasets.values() for c in names))
+
+        # Reserving Class Types: first row per Name, with Source / Formula / EEX Formula pre-parsed
+        self.rsv_cls_name_lookup = {str(v).lower(): v for v in rsv_cls_types['Name'].dropna()}
+        self.rsv_cls_types = {}
+        self.rsv_cls_members = {}  # Level -> names
+        for row in rsv_cls_types.to_dict('records'):
+            name = row['Name']
+            self.rsv_cls_members.setdefault(row.get('Level', ''), []).append(name)
+            if name in self.rsv_cls_types:
+                continue
+            source, formula, eex_formula = row.get('Source', ''), row.get('Formula', ''), row.get('EEX Formula', '')
+            self.rsv_cls_types[name] = {
+                'source': split_formula_with_ops(source) if source != '' else None,
+                'formula': split_formula_with_ops(formula) if formula != '' else None,
+                'eex': split_formula(eex_formula) if eex_formula != '' else None,
+            }
+
+        self.path_plans = {}  # Path -> (included, excluded, adjusted)
+
+    def resolve_path(self, path):
+        """
+        Reserving class values to include / flip / zero (EEX) at each level of a backslash-separated Path.
+        """
+        plan = self.path_plans.get(path)
+        if plan is None:
+            plan = self.path_plans[path] = self._resolve_path(path)
+        return plan
+
+    def _resolve_path(self, path):
+        included_rsv_cls_types = []  # use original value
+        excluded_rsv_cls_types = []  # use negative value
+        adjusted_rsv_cls_types = []  # change values to zero for EEX calculations
+
+        for level, rsv_cls_type in enumerate(path.split('\\'), start=1):  # loop through N levels of reserving class
+            if level > len(self.rsv_cls_col_names):
+                break
+            rsv_cls_type = self.rsv_cls_name_lookup[rsv_cls_type.lower()]
+            rsv_cls_info = self.rsv_cls_types[rsv_cls_type]
+
+            included = [rsv_cls_type]  # always include the input value itself
+            excluded = []
+            adjusted = []
+
+            # Also include Source-derived values for data matching (handles name aliases like "New" -> "N")
+            if rsv_cls_info['source'] is not None:
+                for name, opt in zip(*rsv_cls_info['source']):
+                    if opt == '-' and name not in excluded:
+                        excluded.append(name)
+                    if name not in included:
+                        included.append(name)
+
+            if rsv_cls_info['formula'] is not None:
+                if rsv_cls_info['eex'] is not None:
+                    # Adjusted = all members at this level NOT in eex_formula (not dependent on formula)
+                    adjusted = list(set(self.rsv_cls_members.get(str(level), [])) - set(rsv_cls_info['eex']))
+
+                for name, opt in zip(*rsv_cls_info['formula']):
+                    if opt == '-':
+                        excluded.append(name)
+                    included.append(name)
+
+            included_rsv_cls_types.append(list(set(included)))
+            excluded_rsv_cls_types.append(list(set(excluded)))
+            adjusted_rsv_cls_types.append(list(set(adjusted)))
+
+        return included_rsv_cls_types, excluded_rsv_cls_types, adjusted_rsv_cls_types
+
+
+def _table_cache_root():
+    default_root = os.path.join(os.environ.get("LOCALAPPDATA") or tempfile.gettempdir(), "ADAS", "table_cache")
+    return get_config_value('apps.agent.table_cache_dir', default_root)
+
+
+def _table_image_dir(csv_path, st):
+    """
+    Sidecar folder for one version of a source table: <stem>-<path hash>-<size/mtime hash>.
+    """
+    path_key = _table_key(csv_path)
+    path_hash = hashlib.sha1(path_key.encode("utf-8")).hexdigest()[:12]
+    version_hash = hashlib.sha1(f"{st.st_size}|{st.st_mtime_ns}".encode("utf-8")).hexdigest()[:12]
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(_table_cache_root(), f"{stem}-{path_hash}-{version_hash}")
+
+
+def _codes_dtype(n_categories):
+    # Same code widths pandas picks for a Categorical, so mapped codes are used without a copy
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _json_default(obj):
+    # numpy scalars in category lists
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _write_image_column(folder, stem, values):
+    # One column of a table image: <stem>.npy (the values, or a string column's integer codes) + <stem>.json
+    col_info = {"name": values.name}
+    data = values.to_numpy()
+    if data.dtype.kind in "biuf":
+        col_info["kind"] = "numeric"
+    else:
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes, categories = values.cat.codes.to_numpy(), values.cat.categories
+        else:
+            codes, categories = pd.factorize(values)
+        data = codes.astype(_codes_dtype(len(categories)))
+        col_info["kind"] = "codes"
+        col_info["categories"] = list(categories)
+    np.save(os.path.join(folder, f"{stem}.npy"), data, allow_pickle=False)
+    with open(os.path.join(folder, f"{stem}.json"), mode="w", encoding="utf-8") as f:
+        json.dump(col_info, f, default=_json_default)
+
+
+def _image_column_files(table_info):
+    # File stem of each column of a table image (c0, c1, ... unless columns were added later)
+    return table_info.get("files") or [f"c{i}" for i in range(len(table_info["columns"]))]
+
+
+def _write_table_image(image_dir, csv_path, st, df, append_state=None):
+    """
+    Write a typed, columnar image of df: one .npy per column plus a small JSON
+    header per column. String columns are stored as integer codes + categories.
+    The folder is built under a temporary name and renamed into place.
+    append_state: the checksum taken while the source was parsed (see _ChecksumReader),
+    kept so a load from the image can still merge appended rows.
+    """
+    if os.path.exists(image_dir):
+        return
+
+    tmp_dir = f"{image_dir}.{uuid.uuid4().hex}.tmp"
+    os.makedirs(tmp_dir)
+    try:
+        files = [f"c{i}" for i in range(len(df.columns))]
+        for stem, col in zip(files, df.columns):
+            _write_image_column(tmp_dir, stem, df[col])
+
+        table_info = {
+            "path": os.path.abspath(csv_path),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "rows": len(df),
+            "columns": list(df.columns),
+            "files": files,
+        }
+        if append_state is not None and append_state['offset'] == st.st_size:
+            table_info.update(checksum=append_state['checksum'], complete=append_state['complete'],
+                              sha1=append_state['digest'])
+        with open(os.path.join(tmp_dir, "table.json"), mode="w", encoding="utf-8") as f:
+            json.dump(table_info, f, default=_json_default)
+
+        os.rename(tmp_dir, image_dir)
+    except OSError:
+        # another agent published the same image first, or the cache folder is not writable
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.exists(image_dir):
+            raise
+
+
+def _extend_table_image(image_dir, st, new_columns):
+    """
+    Add columns to a table image (see _write_table_image) once a load reads more of the source
+    than the image holds, so later loads do not parse them from the CSV again. The new column
+    files get unique names before table.json is replaced to list them: readers see the image
+    with or without them, and the columns other agents have mapped stay in place.
+    """
+    table_json = os.path.join(image_dir, "table.json")
+    if not os.path.exists(table_json):
+        return
+    table_info = _read_json(table_json)
+    if table_info["size"] != st.st_size or table_info["mtime_ns"] != st.st_mtime_ns \
+            or table_info["rows"] != len(new_columns):
+        return
+
+    files = _image_column_files(table_info)
+    for col in new_columns.columns:
+        if col not in table_info["columns"]:
+            stem = f"c{uuid.uuid4().hex[:12]}"
+            _write_image_column(image_dir, stem, new_columns[col])
+            table_info["columns"].append(col)
+            files.append(stem)
+    table_info["files"] = files
+
+    tmp_json = f"{table_json}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_json, mode="w", encoding="utf-8") as f:
+        json.dump(table_info, f, default=_json_default)
+    os.replace(tmp_json, table_json)
+
+
+def _load_table_image(image_dir, st, mmap=False, category_cols=()):
+    """
+    Load a table image written by _write_table_image. Returns None if missing or stale.
+    String columns listed in category_cols are restored as categoricals, the rest as objects.
+
+    mmap=True maps every column read-only instead of reading it into private memory,
+    so agents on the same machine share one copy of the table through the OS page cache.
+    String columns then come back as categoricals backed by the mapped codes.
+    """
+    table_json = os.path.join(image_dir, "table.json")
+    if not os.path.exists(table_json):
+        return None
+
+    table_info = _read_json(table_json)
+    if table_info["size"] != st.st_size or table_info["mtime_ns"] != st.st_mtime_ns:
+        return None
+
+    data = {}
+    for stem, col in zip(_image_column_files(table_info), table_info["columns"]):
+        col_info = _read_json(os.path.join(image_dir, f"{stem}.json"))
+        values = np.load(os.path.join(image_dir, f"{stem}.npy"), mmap_mode="r" if mmap else None, allow_pickle=False)
+        if col_info["kind"] == "codes":
+            if mmap or col in category_cols:
+                dtype = pd.CategoricalDtype(col_info["categories"])
+                values = pd.Categorical.from_codes(values, dtype=dtype, validate=False)
+            else:
+                categories = np.empty(len(col_info["categories"]) + 1, dtype=object)
+                categories[:-1] = col_info["categories"]
+                categories[-1] = np.nan  # code -1 -> NaN
+                values = categories[values]
+        data[col] = values
+
+    return pd.DataFrame(data, columns=table_info["columns"], copy=False)
+
+
+def _table_image_append_state(image_dir):
+    # The append state a table image was written with (see _write_table_image), None if it has none
+    table_info = _read_json(os.path.join(image_dir, "table.json"))
+    if "checksum" not in table_info:
+        return None
+    return {'offset': table_info["size"], 'checksum': table_info["checksum"], 'complete': table_info["complete"],
+            'sha1': None, 'digest': table_info.get("sha1")}
+
+
+def _prune_table_images(image_dir):
+    # Remove images of older versions of the same table (same <stem>-<path hash> prefix)
+    prefix = os.path.basename(image_dir).rsplit("-", 1)[0] + "-"
+    root = os.path.dirname(image_dir)
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name.startswith(prefix) and path != image_dir and not name.endswith(".tmp"):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _build_table_image(image_dir, csv_path, st, df, key=None, category_cols=(), append_state=None,
+                       new_columns=None):
+    """
+    Write df's table image, or with new_columns (columns df has beyond an existing image) add
+    those to it; then swap the loaded table for its mapping.
+    """
+    try:
+        if new_columns is None:
+            _write_table_image(image_dir, csv_path, st, df, append_state)
+            _prune_table_images(image_dir)
+        else:
+            _extend_table_image(image_dir, st, new_columns)
+        print(f"Table image saved -- [{os.path.basename(image_dir)}]")
+    except Exception as e:
+        print(f"Error saving table image for [{os.path.basename(csv_path)}]: {e}")
+        return
+
+    # Swap the freshly parsed (private) table for its shared mapping
+    if key is not None and get_config_value('apps.agent.mmap_tables', True):
+        mapped = _load_table_image(image_dir, st, mmap=True, category_cols=category_cols)
+        with DATA_DICT_LOCK:
+            if mapped is not None and DATA_DICT.get(key) is df and list(mapped.columns) == list(df.columns):
+                DATA_DICT[key] = mapped
+                if key in DATA_DICT_LRU:
+                    DATA_DICT_LRU[key] = _table_bytes(mapped)  # mapped columns are no longer private
+
+
+def _encode_categorical_columns(df, cols):
+    """
+    Store string columns as integer-coded categoricals (categories = per-table dictionary).
+    """
+    for col in cols:
+        if col in df.columns and df[col].dtype == object:
+            df[col] = df[col].astype("category")
+
+
+def _class_values(values, dtype):
+    """
+    Reserving class values (VPS names) in the type of a class column of dtype, so '10'
+    matches 10 in a numeric column and 10 matches '10' in a text one. Resident and
+    scanned tables filter through it alike; values that do not convert match nothing.
+    """
+    if isinstance(dtype, pd.CategoricalDtype):
+        dtype = dtype.categories.dtype
+    if dtype == bool or not pd.api.types.is_numeric_dtype(dtype):
+        return [str(v) for v in values]
+
+    numbers = pd.to_numeric(pd.Series([str(v) for v in values], dtype=object), errors='coerce').dropna()
+    if pd.api.types.is_integer_dtype(dtype):
+        return [int(v) for v in numbers if float(v).is_integer()]
+    return [float(v) for v in numbers]
+
+
+def _isin_mask(series, values):
+    """
+    Boolean array equivalent of series.isin(values).
+    Categorical columns are matched on their integer codes through a lookup table.
+    """
+    values = _class_values(values, series.dtype)
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return series.isin(values).to_numpy()
+
+    categories = series.cat.categories
+    wanted = categories.get_indexer(pd.Index(values, dtype=object))
+    lookup = np.zeros(len(categories) + 1, dtype=bool)  # last slot: code -1 (NaN)
+    lookup[wanted[wanted >= 0]] = True
+    return lookup[series.cat.codes.to_numpy()]
+
+
+def _table_schema(vps_index):
+    """
+    Column kinds of a project's source table from its field mapping and Dataset Types:
+    'date' (origin / development date), 'class' (reserving class), 'amount' (dataset columns).
+    """
+    schema = {c: 'amount' for c in vps_index.dataset_cols}
+    schema.update({c: 'date' for c in vps_index.date_cols if c != ''})
+    schema.update({c: 'class' for c in vps_index.rsv_cls_col_names})
+    return schema
+
+
+def _downcast_table_columns(df, schema):
+    """
+    Type the columns of df by schema (see _table_schema): dates as int32 YYYYMM (when they are
+    whole numbers without gaps), classes as categoricals, amounts as float64, or float32 with
+    apps.agent.float32_amounts. Columns that do not parse as expected are left as they are.
+    """
+    amount_dtype = np.float32 if get_config_value('apps.agent.float32_amounts', False) else np.float64
+    int32 = np.iinfo(np.int32)
+
+    for col, kind in schema.items():
+        if col not in df.columns:
+            continue
+        values = df[col]
+        if kind == 'class':
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                df[col] = values.astype('category')
+        elif not pd.api.types.is_numeric_dtype(values.dtype) or values.dtype == bool:
+            continue
+        elif kind == 'date':
+            if values.notna().all() and (values % 1 == 0).all() \
+                    and (len(values) == 0 or int32.min <= values.min() <= values.max() <= int32.max):
+                df[col] = values.astype(np.int32)
+        elif kind == 'amount':
+            df[col] = values.astype(amount_dtype)
+    return df
+
+
+def _object_column_bytes(values):
+    # Estimated size of a categorical column as default-parsed Python strings (8-byte pointers + objects)
+    object_sizes = np.array([sys.getsizeof(v) for v in values.cat.categories] + [sys.getsizeof(np.nan)])
+    return 8 * len(values) + int(object_sizes[values.cat.codes.to_numpy()].sum())
+
+
+def _read_csv_chunked(csv_path, schema, usecols=None, source=None):
+    """
+    Stream a source CSV in chunks of apps.agent.ingest_chunk_rows rows and type each chunk by
+    schema as it is read (see _downcast_table_columns), so the default-typed parse of the whole
+    file is never held at once. Reports the memory saved per column against a default parse.
+    source: an open binary file of csv_path to read instead.
+    """
+    chunk_rows = get_config_value('apps.agent.ingest_chunk_rows', 500_000)
+    class_cols = [c for c, kind in schema.items() if kind == 'class']
+
+    chunks, default_bytes = [], {}
+    with pd.read_csv(source or csv_path, chunksize=chunk_rows, usecols=usecols,
+                     dtype=dict.fromkeys(class_cols, 'category')) as reader:
+        for chunk in reader:
+            for col in chunk.columns:
+                if schema.get(col) == 'class' and isinstance(chunk[col].dtype, pd.CategoricalDtype):
+                    size = _object_column_bytes(chunk[col])
+                else:
+                    size = int(chunk[col].memory_usage(index=False, deep=True))
+                default_bytes[col] = default_bytes.get(col, 0) + size
+            chunks.append(_downcast_table_columns(chunk, schema))
+
+    if len(chunks) == 1:
+        df = chunks[0]
+    else:
+        data = {}
+        for col in chunks[0].columns:
+            parts = [chunk[col] for chunk in chunks]
+            if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+                data[col] = pd.api.types.union_categoricals([part.array for part in parts])
+            else:
+                data[col] = pd.concat(parts, ignore_index=True)
+        df = pd.DataFrame(data, columns=chunks[0].columns)
+    del chunks
+
+    total_before = total_after = 0
+    for col in df.columns:
+        before, after = default_bytes[col], int(df[col].memory_usage(index=False, deep=True))
+        total_before, total_after = total_before + before, total_after + after
+        if after < before:
+            print(f"  {col} [{df[col].dtype}]: {before / 1024**2:,.1f} MB -> {after / 1024**2:,.1f} MB")
+    print(f"Chunked ingest -- [{os.path.basename(csv_path)}] {len(df):,} rows, "
+          f"{total_before / 1024**2:,.1f} MB -> {total_after / 1024**2:,.1f} MB")
+    return df
+
+
+def _read_csv_header(csv_path):
+    return list(pd.read_csv(csv_path, nrows=0).columns)
+
+
+def _columnar_entry(table_path):
+    """
+    COLUMNAR_TABLES entry of a columnar table at its current ChangeTracker version (a new,
+    empty one once the table changed), so requests on a scanned table do not list its
+    folder and rebuild its dataset each time.
+    """
+    key = _table_key(table_path)
+    version = CHANGE_TRACKER.version(table_path)
+    with COLUMNAR_TABLES_LOCK:
+        entry = COLUMNAR_TABLES.get(key)
+        if entry is None or entry['version'] != version:
+            entry = COLUMNAR_TABLES[key] = {'version': version}
+    return entry
+
+
+def _columnar_format(table_path):
+    """
+    'parquet' / 'feather' for a columnar source table (a file, or a folder of hive-partitioned
+    files), None for a CSV.
+    """
+    if not os.path.isdir(table_path):
+        return COLUMNAR_FORMATS.get(os.path.splitext(table_path)[1].lower())
+
+    entry = _columnar_entry(table_path)
+    if 'format' not in entry:
+        entry['format'] = _folder_format(table_path)
+    return entry['format']
+
+
+def _folder_format(folder):
+    # Format of the first columnar file under a partitioned folder (Parquet if it has none yet)
+    for _, _, files in os.walk(folder):
+        for name in files:
+            table_format = COLUMNAR_FORMATS.get(os.path.splitext(name)[1].lower())
+            if table_format is not None:
+                return table_format
+    return 'parquet'
+
+
+def _columnar_dataset(table_path):
+    if pa_ds is None:
+        raise ImportError(f"pyarrow is needed to read [{os.path.basename(table_path)}]")
+    entry = _columnar_entry(table_path)
+    if 'dataset' not in entry:
+        partitioning = 'hive' if os.path.isdir(table_path) else None
+        entry['dataset'] = pa_ds.dataset(table_path, format=_columnar_format(table_path), partitioning=partitioning)
+    return entry['dataset']
+
+
+def _columnar_size(table_path):
+    if not os.path.isdir(table_path):
+        return os.path.getsize(table_path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(table_path) for name in files)
+
+
+def _read_columnar(table_path, columns=None, category_cols=(), filter=None):
+    """
+    Read a Parquet / Feather source table: only the listed columns if columns is given, and
+    only the rows matching filter (a pyarrow expression; row groups and partitions that
+    cannot match are skipped without being read).
+    """
+    dataset = _columnar_dataset(table_path)
+    if columns is not None:
+        columns = set(columns)
+        columns = [c for c in dataset.schema.names if c in columns] or None
+    df = dataset.to_table(columns=columns, filter=filter).to_pandas()
+    _encode_categorical_columns(df, category_cols)
+    return df
+
+
+def _columnar_min_max(table_path, columns):
+    """
+    Min and max of columns over a whole columnar table (Series indexed by column), read
+    batch by batch so only those columns of one batch are in memory at a time.
+    """
+    mins, maxs = [], []
+    for batch in _columnar_dataset(table_path).to_batches(columns=list(columns)):
+        frame = batch.to_pandas()
+        mins.append(frame.min())
+        maxs.append(frame.max())
+    return pd.concat(mins, axis=1).min(axis=1), pd.concat(maxs, axis=1).max(axis=1)
+
+
+def _class_filter(dataset, rsv_cls_col_names, included_rsv_cls_types):
+    # pyarrow expression for the reserving class filter of _filter_main_table (None = all rows)
+    expression = None
+    for col, allowed_values in zip(rsv_cls_col_names, included_rsv_cls_types):
+        if not allowed_values or col not in dataset.schema.names:
+            continue
+        field = pa_ds.field(col)
+        column_type = dataset.schema.field(col).type
+        value_type = getattr(column_type, 'value_type', column_type)  # dictionary-encoded columns
+        if value_type != column_type:
+            field = field.cast(value_type)
+        try:
+            dtype = np.dtype(value_type.to_pandas_dtype())
+        except (NotImplementedError, TypeError):
+            dtype = np.dtype(object)
+        condition = field.isin(_class_values(allowed_values, dtype))
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _scan_table(table_path, columns, category_cols, rsv_cls_col_names, included_rsv_cls_types):
+    """
+    Rows of a non-resident columnar table that pass a request's reserving class filter.
+    """
+    dataset = _columnar_dataset(table_path)
+    return _read_columnar(table_path, columns, category_cols,
+                          filter=_class_filter(dataset, rsv_cls_col_names, included_rsv_cls_types))
+
+
+def _read_source_header(table_path):
+    if _columnar_format(table_path) is not None:
+        return list(_columnar_dataset(table_path).schema.names)
+    return _read_csv_header(table_path)
+
+
+def _parse_source(table_path, columns=None, category_cols=(), schema=None):
+    if _columnar_format(table_path) is not None:
+        return _read_columnar(table_path, columns, category_cols)
+    return _parse_csv(table_path, columns, category_cols, schema)
+
+
+def _parse_csv(csv_path, columns=None, category_cols=(), schema=None, header=None, source=None):
+    """
+    Parse a source CSV, only the listed columns if columns is given (all of them if none
+    of the listed columns is in the file). With apps.agent.chunked_ingest and a schema
+    (see _table_schema) the CSV is streamed and typed chunk by chunk.
+    header: the file's column names if the caller already read them.
+    source: an open binary file of csv_path to read instead (see _ChecksumReader).
+    """
+    usecols = None
+    if columns is not None:
+        columns = set(columns)
+        if columns & set(header or _read_csv_header(csv_path)):
+            usecols = lambda c: c in columns
+
+    if schema and get_config_value('apps.agent.chunked_ingest', False):
+        return _read_csv_chunked(csv_path, schema, usecols, source)
+
+    df = pd.read_csv(source or csv_path, usecols=usecols)
+    _encode_categorical_columns(df, category_cols)
+    return df
+
+
+def _with_columns(df, new_columns):
+    # df plus the columns of new_columns (same rows), without copying df's (possibly mapped) columns
+    data = {c: df[c] for c in df.columns}
+    data.update({c: new_columns[c] for c in new_columns.columns})
+    return pd.DataFrame(data, columns=list(data), copy=False)
+
+
+def _read_table(csv_path, key=None, category_cols=(), schema=None, columns=None, header=None):
+    """
+    Read a source table, preferring its columnar image in the local table store.
+    The image is keyed by path + size + mtime and (re)built off-thread after a CSV parse.
+    With apps.agent.mmap_tables the image is memory-mapped and shared by all agents
+    on the machine; key is the DATA_DICT entry to swap to the mapping once it is built.
+    String columns in category_cols (reserving classes) are integer-coded categoricals.
+    columns limits the parse to the columns a project reads (see _parse_csv); an image
+    missing some of them gets just those parsed from the CSV, and added to the image
+    off-thread (see _extend_table_image).
+    header: the CSV's column names if the caller already read them.
+    Parquet / Feather tables are already columnar and are read directly.
+
+    Returns (df, append state): with apps.agent.incremental_refresh or apps.agent.table_hash the
+    checksum of the CSV taken in the same pass as the parse, or stored with the image (see
+    _ChecksumReader.state), else None.
+    """
+    if _columnar_format(csv_path) is not None:
+        return _read_columnar(csv_path, columns, category_cols), None
+
+    st = os.stat(csv_path)
+    use_cache = get_config_value('apps.agent.table_cache', True)
+    use_mmap = get_config_value('apps.agent.mmap_tables', True)
+    header = header or _read_csv_header(csv_path)
+
+    if use_cache:
+        image_dir = _table_image_dir(csv_path, st)
+        try:
+            df = _load_table_image(image_dir, st, mmap=use_mmap, category_cols=category_cols)
+            if df is not None:
+                missing = [c for c in header if c not in df.columns and (columns is None or c in columns)]
+                if missing:
+                    new_columns = _parse_csv(csv_path, missing, category_cols, schema, header)
+                    df = _with_columns(df, new_columns)
+                    threading.Thread(target=_build_table_image,
+                                     args=(image_dir, csv_path, st, df, key, category_cols, None, new_columns),
+                                     daemon=True).start()
+                return df, _table_image_append_state(image_dir)
+        except Exception as e:
+            print(f"Error loading table image for [{os.path.basename(csv_path)}]: {e}")
+
+    append_state = None
+    sha1 = hashlib.sha1() if get_config_value('apps.agent.table_hash', False) else None
+    if sha1 is not None or get_config_value('apps.agent.incremental_refresh', True):
+        with open(csv_path, mode='rb') as f:
+            reader = _ChecksumReader(f, sha1)
+            df = _parse_csv(csv_path, columns, category_cols, schema, header, reader)
+            append_state = reader.state()
+        if append_state['offset'] != st.st_size:
+            append_state = None  # changed during the parse
+    else:
+        df = _parse_csv(csv_path, columns, category_cols, schema, header)
+
+    if use_cache:
+        threading.Thread(target=_build_table_image,
+                         args=(image_dir, csv_path, st, df, key, category_cols, append_state),
+                         daemon=True).start()
+
+    return df, append_state
 
 
-def load_to_DATA_DICT(csv_path):
+class _TableLoad:
+    """
+    One in-flight table load; concurrent requests for the same table wait on it.
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+
+def load_to_DATA_DICT(csv_path, category_cols=(), schema=None, columns=None):
+    """
+    Parse a table without holding DATA_DICT_LOCK, then swap it in atomically.
+    columns: the columns to load (None = all), see _read_table.
+    """
     print(f"Loading Data Table {csv_path} @ {get_current_time()}")
-    key = os.path.basename(csv_path)
-    _enforce_data_dict_limit(max_tables=10)
-    DATA_DICT[key] = pd.read_csv(csv_path)
-    DATA_DICT[key + " - Version"] = datetime.now()
-    if key not in DATA_DICT_LOAD_ORDER:
-        DATA_DICT_LOAD_ORDER.append(key)
-    print(f"Data Table Loaded @ {get_current_time()}")
+    key = _table_key(csv_path)
+    version = CHANGE_TRACKER.version(csv_path)  # taken before the read, so a change during the parse is not missed
+    st = os.stat(csv_path)
+    header = _read_source_header(csv_path)
+    columnar = _columnar_format(csv_path) is not None
+
+    # Columnar tables over apps.agent.scan_table_bytes are not kept resident: requests read
+    # their own rows (_scan_table); DATA_DICT keeps a one-row sample for columns and date format
+    scan = columnar and _columnar_size(csv_path) > get_config_value('apps.agent.scan_table_bytes',
+                                                                      DEFAULT_SCAN_TABLE_BYTES)
+    append_state = None
+    if scan:
+        df = _columnar_dataset(csv_path).head(1).to_pandas()
+        _encode_categorical_columns(df, category_cols)
+    else:
+        df, append_state = _read_table(csv_path, key, category_cols, schema, columns, header)
+
+    # Appended rows can only be merged into CSV tables; the checksum of their parse also hashes the content
+    if not _same_file_version(csv_path, st):
+        identity, append_state = version, None  # changed during the read: not content-verified
+    else:
+        identity = _table_identity(csv_path, version, append_state and append_state['digest'])
+    if not get_config_value('apps.agent.incremental_refresh', True):
+        append_state = None
+    with DATA_DICT_LOCK:
+        _add_table(key, df, version, identity)
+        TABLE_APPEND_STATE[key] = append_state
+        TABLE_HEADERS[key] = header
+        if scan:
+            TABLE_SCANS[key] = csv_path
+        else:
+            TABLE_SCANS.pop(key, None)
+    print(f"Data Table {'Scanned per request' if scan else 'Loaded'} @ {get_current_time()}")
+
+
+def add_columns_to_DATA_DICT(csv_path, columns, category_cols=(), schema=None):
+    """
+    Add source columns a column-projected table left out, once a request needs them (e.g. a
+    Dataset Types Source that now reads another column). Only those columns are parsed; the
+    table version changes with its columns. Returns False, with nothing changed, if the
+    source changed since the table was loaded; the caller then reloads the table.
+    """
+    key = _table_key(csv_path)
+    with DATA_DICT_LOCK:
+        df = DATA_DICT.get(key)
+        table_version = DATA_DICT.get(key + " - Version")
+        version = TABLE_STATS.get(key)
+    if df is None:
+        return False
+
+    st = os.stat(csv_path)
+    new_columns = _parse_source(csv_path, columns, category_cols, schema)
+    if len(new_columns) != len(df) or not _same_file_version(csv_path, st) \
+            or CHANGE_TRACKER.version(csv_path) != version:
+        return False
+
+    df = _with_columns(df, new_columns)
+    with DATA_DICT_LOCK:
+        if DATA_DICT.get(key + " - Version") != table_version:
+            return False
+        _add_table(key, df, version, table_version[0])
+
+    if _columnar_format(csv_path) is None and get_config_value('apps.agent.table_cache', True):
+        threading.Thread(target=_build_table_image,
+                         args=(_table_image_dir(csv_path, st), csv_path, st, df, key, category_cols, None, new_columns),
+                         daemon=True).start()
+    print(f"Added columns to Data Table {csv_path}: {', '.join(columns)} @ {get_current_time()}")
+    return True
+
+
+def _same_file_version(path, st):
+    try:
+        st2 = os.stat(path)
+    except OSError:
+        return False
+    return (st2.st_size, st2.st_mtime_ns) == (st.st_size, st.st_mtime_ns)
+
+
+def _crc_prefix(f, size):
+    """
+    CRC-32 of the first size bytes of open file f, read in APPEND_CHECK_BYTES blocks.
+    Bytes are compared, not parsed.
+    """
+    checksum, remaining = 0, size
+    while remaining > 0:
+        block = f.read(min(remaining, APPEND_CHECK_BYTES))
+        if not block:
+            break
+        checksum = zlib.crc32(block, checksum)
+        remaining -= len(block)
+    return checksum
+
+
+class _ChecksumReader:
+    """
+    A source CSV opened for a parse that also takes the append state of the bytes read (see
+    state): pandas reads through it, so the checksum costs no second pass over the file.
+    sha1: a hashlib object updated with the same bytes (apps.agent.table_hash).
+    """
+    def __init__(self, f, sha1=None):
+        self.f = f
+        self.sha1 = sha1
+        self.checksum = 0
+        self.offset = 0
+        self.last = b''
+
+    def read(self, size=-1):
+        block = self.f.read(size)
+        if block:
+            self.checksum = zlib.crc32(block, self.checksum)
+            if self.sha1 is not None:
+                self.sha1.update(block)
+            self.offset += len(block)
+            self.last = block[-1:]
+        return block
+
+    def state(self):
+        """
+        Where the parse ended: the byte offset, a checksum of every byte before it, whether it
+        ended on a complete line, and the SHA-1 of those bytes (a hashlib object, so appended
+        bytes can extend it, and its hex digest).
+        """
+        self.read()  # bytes the parser did not need
+        return {'offset': self.offset, 'checksum': self.checksum, 'complete': self.last == b'\n',
+                'sha1': self.sha1, 'digest': self.sha1.hexdigest() if self.sha1 is not None else None}
+
+
+def _read_appended_rows(data, df, header):
+    """
+    Parse rows appended after a table's last parse (the loaded columns of the source
+    header), typed like the table: text and categorical columns stay text, numeric columns
+    must still parse as numbers. Returns None when the rows do not fit the table (a full
+    reload reads them instead).
+    """
+    text_cols = {c: object for c in df.columns if not pd.api.types.is_numeric_dtype(df[c].dtype)}
+    try:
+        new_rows = pd.read_csv(io.BytesIO(data), header=None, names=header, usecols=list(df.columns),
+                               dtype=text_cols, index_col=False)
+    except Exception as e:
+        print(f"Appended rows not readable: {e}")
+        return None
+
+    for col in df.columns:
+        if col not in text_cols and not pd.api.types.is_numeric_dtype(new_rows[col].dtype):
+            return None
+    return new_rows
+
+
+def _merge_appended_rows(df, new_rows):
+    data = {}
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            # Existing codes keep their meaning; new values are appended as new categories
+            data[col] = pd.api.types.union_categoricals(
+                [df[col].array, pd.Categorical(new_rows[col])], ignore_order=True)
+        else:
+            data[col] = pd.concat([df[col], new_rows[col]], ignore_index=True)
+    return pd.DataFrame(data, columns=df.columns)
+
+
+def _append_to_loss_cube(key, old_version, version, new_rows):
+    # Add the new rows' sums to the cube of the previous table version, if there is one
+    with CUBE_DICT_LOCK:
+        entry = CUBE_DICT.get(key)
+    if entry is None or entry['version'] != old_version:
+        return
+
+    key_cols = entry['key_cols']
+    value_cols = [c for c in entry['df'].columns if c not in key_cols]
+    if not all(pd.api.types.is_numeric_dtype(new_rows[c].dtype) for c in value_cols):
+        return
+
+    cube = pd.concat([entry['df'], _build_loss_cube(new_rows[key_cols + value_cols], key_cols)], ignore_index=True)
+    cube = cube.groupby(key_cols, observed=True, dropna=False, sort=False)[value_cols].sum().reset_index()
+    with CUBE_DICT_LOCK:
+        if CUBE_DICT.get(key) is entry:
+            CUBE_DICT[key] = {'version': version, 'key_cols': key_cols, 'df': cube}
+
+
+def append_to_DATA_DICT(csv_path, category_cols=(), schema=None):
+    """
+    Refresh a loaded table whose source only gained rows at the end (e.g. a new valuation
+    month): parse just the bytes after the last parse and merge them into the table and its
+    loss cube. Returns False, with nothing changed, when the change is not a pure append;
+    the caller then reloads the whole table.
+    """
+    key = _table_key(csv_path)
+    with DATA_DICT_LOCK:
+        df = DATA_DICT.get(key)
+        old_version = DATA_DICT.get(key + " - Version")
+        state = TABLE_APPEND_STATE.get(key)
+        header = TABLE_HEADERS.get(key)
+    if df is None or state is None or header is None or not state['complete']:
+        return False
+
+    version = CHANGE_TRACKER.version(csv_path)
+    st = os.stat(csv_path)
+    offset = state['offset']
+    if st.st_size <= offset:
+        return False
+
+    # Any change to the rows already loaded (e.g. a restated month) needs a full reload
+    with open(csv_path, mode='rb') as f:
+        if _crc_prefix(f, offset) != state['checksum']:
+            return False
+        data = f.read(st.st_size - offset)
+
+    new_rows = _read_appended_rows(data, df, header)
+    if new_rows is None or not _same_file_version(csv_path, st):
+        return False
+    if schema and get_config_value('apps.agent.chunked_ingest', False):
+        new_rows = _downcast_table_columns(new_rows, schema)  # keep the table's downcast dtypes
+
+    merged = _merge_appended_rows(df, new_rows)
+    # The content hash is extended with the appended bytes; without one the table is not content-verified
+    sha1 = state['sha1']
+    if sha1 is not None:
+        sha1 = sha1.copy()
+        sha1.update(data)
+    digest = sha1.hexdigest() if sha1 is not None else None
+    append_state = {'offset': st.st_size, 'checksum': zlib.crc32(data, state['checksum']),
+                    'complete': data.endswith(b'\n'), 'sha1': sha1, 'digest': digest}
+    identity = version if digest is None else _table_identity(csv_path, version, digest)
+    with DATA_DICT_LOCK:
+        table_version = _add_table(key, merged, version, identity)
+        TABLE_APPEND_STATE[key] = append_state
+
+    _append_to_loss_cube(key, old_version, table_version, new_rows)
+
+    if get_config_value('apps.agent.table_cache', True):
+        threading.Thread(target=_build_table_image,
+                         args=(_table_image_dir(csv_path, st), csv_path, st, merged, key, category_cols,
+                               append_state),
+                         daemon=True).start()
+
+    print(f"Appended {len(new_rows):,} rows to Data Table {csv_path} @ {get_current_time()}")
+    return True
+
+
+def _build_loss_cube(df, key_cols):
+    """
+    Sum every numeric dataset column by key_cols (origin/development date + reserving classes).
+    Filtering, sign flips and bucketing only look at key columns and are linear in the
+    values, so the cube answers triangle requests exactly like the row-level table.
+    """
+    value_cols = [c for c in df.select_dtypes(include=[np.number]).columns if c not in key_cols]
+    return df.groupby(key_cols, observed=True, dropna=False, sort=False)[value_cols].sum().reset_index()
+
+
+def build_loss_cube(table_name, version, df, key_cols):
+    """
+    Build the loss cube of one table version and publish it to CUBE_DICT.
+    """
+    print(f"Building loss cube -- [{table_name}] @ {get_current_time()}")
+    try:
+        cube = _build_loss_cube(df, key_cols)
+    except Exception as e:
+        print(f"Error building loss cube for [{table_name}]: {e}")
+        return
+
+    with CUBE_DICT_LOCK:
+        CUBE_DICT[table_name] = {'version': version, 'key_cols': list(key_cols), 'df': cube}
+
+    table_mb = df.memory_usage(deep=True).sum() / 1024**2
+    cube_mb = cube.memory_usage(deep=True).sum() / 1024**2
+    print(f"Loss cube built -- [{table_name}] {len(df):,} rows -> {len(cube):,} rows, "
+          f"{table_mb:,.1f} MB -> {cube_mb:,.1f} MB ({len(df) / max(len(cube), 1):,.1f}x fewer rows)")
+
+
+def build_loss_cube_in_thread(table_name, version, df, key_cols):
+    t = threading.Thread(target=build_loss_cube, args=(table_name, version, df, key_cols), daemon=True)
+    t.start()
+
+
+def _get_loss_cube(table_name, key_cols, required_datasets):
+    """
+    Return the loss cube of the current table version if it can stand in for the
+    row-level table (same key columns, all required datasets present), else None.
+    """
+    with CUBE_DICT_LOCK:
+        entry = CUBE_DICT.get(table_name)
+    if entry is None or entry['version'] != DATA_DICT.get(table_name + " - Version"):
+        return None
+    if not set(key_cols) <= set(entry['key_cols']):
+        return None
+    if not set(required_datasets) <= set(entry['df'].columns):
+        return None
+    return entry['df']
 
 
 def load_dataframe(data_csv_path):
@@ -398,13 +1655,12 @@ def load_dataframe(data_csv_path):
     '''
     print(get_current_time())
     print(f'Loading Data Table -- [{os.path.basename(data_csv_path)}]')
-    df = pd.read_csv(data_csv_path) # build off-thread
+    key = _table_key(data_csv_path)
+    version = CHANGE_TRACKER.version(data_csv_path)
+    df, append_state = _read_table(data_csv_path, key) # build off-thread
+    identity = _table_identity(data_csv_path, version, append_state and append_state['digest'])
     with DATA_DICT_LOCK:
-        key = os.path.basename(data_csv_path).replace('.csv', '')
-        _enforce_data_dict_limit(max_tables=10)
-        DATA_DICT[key] = df
-        if key not in DATA_DICT_LOAD_ORDER:
-            DATA_DICT_LOAD_ORDER.append(key)
+        _add_table(key, df, version, identity)
 
     print(get_current_time())
     print(f'Data Table Loaded -- [{os.path.basename(data_csv_path)}]')
@@ -464,42 +1720,67 @@ def split_formula_opts(s: str):
     return split_formula_with_ops(s)[1]
 
 
-def read_txt(txt_file, retries=50, delay=0.02):
-    """
-    Reads key=value lines safely with retries.
-    Supports values that contain '='.
-    Ignores blank / malformed lines.
-    """
+BATCH_SEPARATOR = '---'  # starts each call in a batch request file
+
 
-    # ---- 1. Wait until file is available ----
+def _read_lines(txt_file, retries=50, delay=0.02):
+    # Wait until file is available
     for _ in range(retries):
         try:
             with open(txt_file, mode='r', encoding='utf-8') as f:
-                lines = f.readlines()
-            break
+                return f.readlines()
         except PermissionError:
             time.sleep(delay)
+    raise PermissionError(f"Cannot open {txt_file}")
+
+
+def _parse_key_value(line):
+    # Only split at first '='; None for blank / malformed lines
+    if '= ' in line:
+        key, value = line.split(' = ', 1)
+    elif '=' in line:
+        key, value = line.split('=', 1)
     else:
-        raise PermissionError(f"Cannot open {txt_file}")
+        return None
+    return key.strip(), value.strip()
 
-    # ---- 2. Parse key=value ----
+
+def read_txt(txt_file, retries=50, delay=0.02):
+    """
+    Reads key=value lines safely with retries.
+    Supports values that contain '='.
+    Ignores blank / malformed lines.
+    """
     arg_dict = {}
-    for raw in lines:
-        line = raw.strip()
-        if not line:
-            continue
+    for raw in _read_lines(txt_file, retries, delay):
+        pair = _parse_key_value(raw.strip())
+        if pair is not None:
+            arg_dict[pair[0]] = pair[1]
 
-        # Only split at first '='
-        if '= ' in line:
-            key, value = line.split(' = ', 1)
-        elif '=' in line:
-            key, value = line.split('=', 1)
-        else:
+    return arg_dict
+
+
+def read_request_txt(txt_file, retries=50, delay=0.02):
+    """
+    Reads a request file into a list of argument dicts.
+    A plain request file holds one call. A batch file holds several, each starting with a
+    BATCH_SEPARATOR line; key=value lines before the first separator (e.g. UserName,
+    ProjectName) are shared by every call, and a call's own lines override them.
+    """
+    shared, calls = {}, []
+    for raw in _read_lines(txt_file, retries, delay):
+        line = raw.strip()
+        if line == BATCH_SEPARATOR:
+            calls.append({})
             continue
 
-        arg_dict[key.strip()] = value.strip()
+        pair = _parse_key_value(line)
+        if pair is not None:
+            (calls[-1] if calls else shared)[pair[0]] = pair[1]
 
-    return arg_dict
+    if not calls:
+        return [shared]
+    return [{**shared, **call} for call in calls if call]
 
 
 def write_txt(txt_file, arg):
@@ -519,29 +1800,75 @@ def time_diff(time_str_1, time_str_2 = 'Current Time'):
     return time_difference
     
 
-def write_lists_to_csv(csv_path, lists, overwrite=True):
-    folder_path = os.path.dirname(csv_path)
-    tmp_folder = folder_path + '\\tmp'
-    tmp_csv_path = tmp_folder + '\\' + os.path.basename(csv_path)
-   
-    if not os.path.exists(folder_path):
-        os.makedirs(folder_path)
-    if not os.path.exists(tmp_folder):
-        os.makedirs(tmp_folder)
+def _replace_file(src, dst, attempts=5, delay=0.1):
+    """Atomically move src over dst, retrying while dst is held open (e.g. by Excel)."""
+    for i in range(attempts):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if i == attempts - 1:
+                raise
+            time.sleep(delay)
+
+
+def _publish_output(data_path, write):
+    """
+    Write an output file through <folder>\\tmp\\<name> and move it into place.
+    write(tmp_path) produces the content.
+    """
+    folder = os.path.dirname(data_path)
+    tmp_folder = folder + '\\tmp'
+    tmp_data_path = tmp_folder + '\\' + os.path.basename(data_path)
+    os.makedirs(tmp_folder, exist_ok=True)
+
+    write(tmp_data_path)
+    _replace_file(tmp_data_path, data_path)
 
-    if os.path.exists(tmp_csv_path):
-        safe_remove(tmp_csv_path)
 
-    with open(tmp_csv_path, mode='w', newline='', encoding='utf-8') as file:
-        writer = csv.writer(file)
-        for lst in lists:
-            writer.writerow(lst)
+TRIANGLE_BINARY_MAGIC = b"ADASTRI1"
 
-    if os.path.exists(csv_path):
-        safe_remove(csv_path)
 
-    time.sleep(0.05)
-    os.rename(tmp_csv_path, csv_path)
+def _binary_output_path(data_path):
+    return os.path.splitext(data_path)[0] + '.tri'
+
+
+def _write_triangle_binary(path, df):
+    """
+    Compact binary form of a result DataFrame, read by the web app instead of the CSV:
+    8-byte magic, uint32 header length, UTF-8 JSON header {"shape", "index", "columns"},
+    then shape[0] * shape[1] little-endian float64 values in row-major order (NaN = empty).
+    """
+    header = json.dumps({
+        "shape": list(df.shape),
+        "index": list(df.index),
+        "columns": list(df.columns),
+    }, default=_json_default).encode('utf-8')
+    values = np.ascontiguousarray(df.to_numpy(dtype='<f8'))
+
+    with open(path, mode='wb') as f:
+        f.write(TRIANGLE_BINARY_MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        f.write(values.tobytes())
+
+
+def _remove_binary_output(data_path):
+    # A non-triangle output (labels, error message) replaces the CSV: drop any older binary form
+    binary_path = _binary_output_path(data_path)
+    if os.path.exists(binary_path):
+        safe_remove(binary_path)
+
+
+def write_lists_to_csv(csv_path, lists, overwrite=True):
+    def write(tmp_csv_path):
+        with open(tmp_csv_path, mode='w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            for lst in lists:
+                writer.writerow(lst)
+
+    _publish_output(csv_path, write)
+    _remove_binary_output(csv_path)
 
 
 def _calc_age(acc_yrmo, sys_yrmo):
@@ -579,6 +1906,154 @@ def _get_org_label(date_val, org_len):
         return year
 
 
+def _calc_age_vec(acc_yrmo, sys_yrmo):
+    """
+    Vectorized _calc_age over arrays of origin start / development dates.
+    4-digit values (YYYY) are treated as annual, everything else as YYYYMM.
+    """
+    acc = np.asarray(acc_yrmo, dtype=float)
+    sys_ = np.asarray(sys_yrmo, dtype=float)
+
+    is_annual = (acc >= 1000) & (acc < 10000)
+    annual_age = (sys_ - acc) * 12 + 1
+    monthly_age = 12 * (sys_ // 100 - acc // 100) + sys_ % 100 - acc % 100 + 1
+
+    return np.where(is_annual, annual_age, monthly_age)
+
+
+def _bucket_origin(org_dates, org_len, org_index_map, org_label):
+    """
+    Vectorized Org*Grp / Org*Start lookup.
+    Labels are computed once per distinct origin date and broadcast back to the rows.
+
+    Returns:
+        (org_pos, org_start) arrays aligned with org_dates; org_pos is the row
+        position in org_label, or -1 when the label is not part of the triangle
+    """
+    label_pos = {label: i for i, label in enumerate(org_label) if label is not None}
+    uniq, inverse = np.unique(np.asarray(org_dates), return_inverse=True)
+    org_pos = np.array([label_pos.get(_get_org_label(v, org_len), -1) for v in uniq], dtype=np.int64)
+    org_start = np.array([org_index_map.get(v, np.nan) for v in uniq], dtype=float)
+    return org_pos[inverse], org_start[inverse]
+
+
+def _bucket_age(ages, dev_label):
+    """
+    Vectorized Age*Grp: position of the smallest dev label >= age (dev_label is ascending).
+    A position equal to len(dev_label) means the age is beyond the last label.
+    """
+    return np.searchsorted(np.asarray(dev_label), ages, side='left')
+
+
+def _assign_period_buckets_legacy(df1, date_cols, has_dev_date, org_len, org_index_map, dev_label, dev_end):
+    # Row-wise reference implementation, kept for comparison (apps.agent.legacy_bucketing)
+    df1['Org*Grp'] = df1[date_cols[0]].apply(lambda x: _get_org_label(x, org_len))
+
+    df1['Org*Start'] = df1[date_cols[0]].map(org_index_map)
+    # When Development Date is missing, use dev_end from config for Age* (single column triangle)
+    if has_dev_date:
+        df1['Age*'] = df1[['Org*Start', date_cols[1]]].apply(lambda row: _calc_age(row.iloc[0], row.iloc[1]), axis=1)
+    else:
+        df1['Age*'] = df1['Org*Start'].apply(lambda x: _calc_age(x, dev_end))
+
+    # When Development Date is missing (single column), all rows map to the single dev_label value
+    if not has_dev_date:
+        df1['Age*Grp'] = dev_label[0]  # Single column: all rows get the same label
+    else:
+        df1['Age*Grp'] = df1['Age*'].apply(lambda x: min([i for i in dev_label if i >= x]))
+
+    return df1
+
+
+def _bucket_indices(df1, date_cols, has_dev_date, org_len, org_index_map, org_label, dev_label):
+    """
+    Map every row to its (origin, development) cell using integer YYYYMM arithmetic.
+    Produces the same cells as the Org*Grp / Age*Grp labels of _assign_period_buckets_legacy.
+
+    Returns:
+        (org_pos, dev_pos) int arrays; -1 marks rows that fall outside the triangle
+    """
+    org_pos, org_start = _bucket_origin(df1[date_cols[0]].to_numpy(), org_len, org_index_map, org_label)
+
+    # Single column triangle: all rows map to the only dev label
+    if not has_dev_date:
+        return org_pos, np.zeros(len(org_pos), dtype=np.int64)
+
+    ages = _calc_age_vec(org_start, df1[date_cols[1]].to_numpy())
+    dev_pos = _bucket_age(ages, dev_label)
+    dev_pos[dev_pos >= len(dev_label)] = -1
+    return org_pos, dev_pos
+
+
+def _aggregate_triangles(org_pos, dev_pos, values, n_origins, n_devs):
+    """
+    Accumulate all dataset columns into one dense (datasets x origins x devs) array.
+
+    org_pos, dev_pos: cell of every row (from _bucket_indices)
+    values:           (rows x datasets) array, NaN counts as 0 like groupby().sum()
+    """
+    keep = (org_pos >= 0) & (dev_pos >= 0)
+    flat = org_pos[keep] * n_devs + dev_pos[keep]
+    values = np.nan_to_num(np.asarray(values, dtype=float)[keep])
+
+    cube = np.empty((values.shape[1], n_origins, n_devs))
+    for d in range(values.shape[1]):
+        cube[d] = np.bincount(flat, weights=values[:, d], minlength=n_origins * n_devs).reshape(n_origins, n_devs)
+    return cube
+
+
+def _triangles_legacy(df1, date_cols, has_dev_date, org_len, org_index_map, org_label, dev_label, dev_end,
+                      required_datasets, cumulative, project_name):
+    # Label + groupby + pivot reference path, kept for comparison (apps.agent.legacy_bucketing)
+    df1 = _assign_period_buckets_legacy(df1, date_cols, has_dev_date, org_len, org_index_map, dev_label, dev_end)
+    df1 = df1.groupby(['Org*Grp', 'Age*Grp'])[required_datasets].sum().reset_index()
+
+    triangles = {}
+    for name in required_datasets:
+        df2 = df1.pivot_table(
+            index = df1['Org*Grp'], 
+            columns = df1['Age*Grp'], 
+            values = name,
+            aggfunc = 'sum', 
+            fill_value = 0
+        )
+        df2 = df2.reindex(index=org_label, columns=dev_label).fillna(0)
+
+        if cumulative == True: 
+            df2 = df2.cumsum(axis=1)
+
+        data_format = _vps_index(project_name).source_formats.get(name, '')
+        if data_format == 'Vector':
+            df2 = vector_to_triangle(df2.iloc[:, [0]], dev_label)
+
+        triangles[name] = df2
+
+    return triangles
+
+
+def _triangle_cube(df1, date_cols, has_dev_date, org_len, org_index_map, org_label, dev_label, required_datasets):
+    """
+    Bucket the filtered rows once and sum them into a (datasets x origins x devs) array.
+    """
+    org_pos, dev_pos = _bucket_indices(df1, date_cols, has_dev_date, org_len, org_index_map, org_label, dev_label)
+    return _aggregate_triangles(org_pos, dev_pos, df1[required_datasets].to_numpy(dtype=float),
+                                len(org_label), len(dev_label))
+
+
+def _cube_to_triangles(cube, required_datasets, project_name):
+    """
+    Split a triangle cube into one (origins x devs) array per dataset, for eval_triangle_formula.
+    Each array is a view on a slice of the shared 3-D cube; Vector datasets are (origins x 1)
+    views on their first development column and broadcast instead of being copied.
+    """
+    triangles = {}
+    for d, name in enumerate(required_datasets):
+        data_format = _vps_index(project_name).source_formats.get(name, '')
+        triangles[name] = cube[d, :, :1] if data_format == 'Vector' else cube[d]
+
+    return triangles
+
+
 def safe_remove(file_path, attempts=5, delay=0.1):
     """Attempt to remove a file with retries on permission error."""
     for _ in range(attempts):
@@ -589,8 +2064,30 @@ def safe_remove(file_path, attempts=5, delay=0.1):
             return True
         except PermissionError:
             time.sleep(delay)
-
-    return False
+
+    return False
+
+
+CLAIM_BUSY = 'busy'  # claim_request: the file is still held open, claim it again later
+CLAIM_RETRY_SECONDS = 0.5
+
+
+def claim_request(file_path, attempts=50, delay=0.02):
+    """
+    Claim a request file for this agent by renaming it to <name>.<robot_id>.claimed.
+    The rename is atomic, so exactly one agent wins. Returns the claimed path, None if
+    another agent got the file first, or CLAIM_BUSY if the file stayed held open.
+    """
+    claimed_path = f"{file_path}.{robot_id}.claimed"
+    for _ in range(attempts):
+        try:
+            os.rename(file_path, claimed_path)
+            return claimed_path
+        except FileNotFoundError:
+            return None
+        except PermissionError:  # still held open, e.g. by the sender or another agent's rename
+            time.sleep(delay)
+    return CLAIM_BUSY
 
 
 def smart_convert(value: str):
@@ -656,50 +2153,188 @@ def vector_to_triangle(df: pd.Series | pd.DataFrame, colnames=None) -> pd.DataFr
     return pd.DataFrame(arr, index=idx, columns=colnames, dtype=float)
 
 
-def eval_triangle_formula(triangles: dict[str, pd.DataFrame],
+_FORMULA_BINOPS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.true_divide,
+    ast.FloorDiv: np.floor_divide,
+    ast.Mod: np.mod,
+    ast.Pow: np.power,
+}
+
+
+def _formula_node(node):
+    if isinstance(node, ast.Name):
+        return ('name', node.id)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return ('const', node.value)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        return ('neg' if isinstance(node.op, ast.USub) else 'pos', _formula_node(node.operand))
+    if isinstance(node, ast.BinOp) and type(node.op) in _FORMULA_BINOPS:
+        return (type(node.op), _formula_node(node.left), _formula_node(node.right))
+    raise ValueError(f"Unsupported expression in triangle formula: {ast.dump(node)}")
+
+
+@lru_cache(maxsize=4096)
+def _compile_triangle_formula(formula):
+    """
+    Parse a triangle formula ('D = A/B*1000' or 'A/B*1000') once into a tree of tuples:
+    ('name', x), ('const', v), ('neg' | 'pos', e) or (ast operator type, left, right).
+    Only dataset names, numbers, + - * / // % ** and parentheses are accepted.
+    Equal subtrees compare equal, so they can be shared between formulas.
+    """
+    # allow 'D = A/B*1000' or just 'A/B*1000'
+    rhs = str(formula).split('=', 1)[-1].strip()
+    return _formula_node(ast.parse(rhs, mode='eval').body)
+
+
+def _eval_formula_node(node, arrays, memo):
+    value = memo.get(node)
+    if value is not None:
+        return value
+
+    kind = node[0]
+    if kind == 'name':
+        if node[1] not in arrays:
+            raise NameError(f"name '{node[1]}' is not defined")
+        value = arrays[node[1]]
+    elif kind == 'const':
+        value = node[1]
+    elif kind == 'neg':
+        value = np.negative(_eval_formula_node(node[1], arrays, memo))
+    elif kind == 'pos':
+        value = _eval_formula_node(node[1], arrays, memo)
+    else:
+        value = _FORMULA_BINOPS[kind](_eval_formula_node(node[1], arrays, memo), _eval_formula_node(node[2], arrays, memo))
+
+    memo[node] = value
+    return value
+
+
+def eval_triangle_formula(triangles: dict[str, np.ndarray],
                           formula: str,
-                          div0_to_zero: bool = True) -> pd.DataFrame:
+                          shape: tuple[int, int],
+                          div0_to_zero: bool = True,
+                          memo: dict | None = None) -> np.ndarray:
     """
-    triangles: dict like {'A': tri_A, 'B': tri_B, ...} where each value is a pivoted DF
+    triangles: dict like {'A': tri_A, 'B': tri_B, ...}; every value is an (origins x devs) array
+               (or DataFrame) on the same labels, or an (origins x 1) vector that is broadcast
     formula:   e.g. 'D = A/B*1000' or 'A/B*1000' or 'A + B*C'
+    shape:     (origins, devs) of the result
     div0_to_zero: if True, convert inf/NaN from division-by-zero to 0
+    memo:      optional dict shared by formulas evaluated over the same triangles,
+               so common subexpressions are computed once
     """
-    # allow 'D = A/B*1000' or just 'A/B*1000'
-    rhs = formula.split('=', 1)[-1].strip()
-
-    # safety: no builtins; variables come from triangles dict
-    env = {"__builtins__": {}}
+    arrays = {name: np.asarray(tri, dtype=float) for name, tri in triangles.items()}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        value = _eval_formula_node(_compile_triangle_formula(formula), arrays, {} if memo is None else memo)
 
-    # element-wise eval; pandas aligns on index & columns automatically
-    result = eval(rhs, env, triangles)
+    result = np.array(np.broadcast_to(value, shape), dtype=float)  # own copy, safe to edit
 
     if div0_to_zero:
-        result = result.replace([np.inf, -np.inf], np.nan).fillna(0)
-
-    # ensure numeric dtype (optional)
-    return result.astype(float)
+        result[~np.isfinite(result)] = 0
 
+    return result
 
-def _get_df(project_name):
-    table_path = DLOOKUP(BASE_DICT['Project Map'], project_name, 'Project Name', 'Table Path')
-    table_name = os.path.basename(table_path)
 
-    # DATA table cache (guarded)
+def _restamp_table(table_path, version):
+    """
+    Keep a loaded table whose file changed (version) but whose content identity did not,
+    e.g. an extract re-published unchanged (only with apps.agent.table_hash).
+    """
+    if not get_config_value('apps.agent.table_hash', False):
+        return False
+    key = _table_key(table_path)
     with DATA_DICT_LOCK:
-        need_load = (table_name not in DATA_DICT) or (DATA_DICT.get(table_name + " - Version") is None) \
-                    or (DATA_DICT[table_name + " - Version"] < File(table_path).last_modified_time)
+        if key not in DATA_DICT:
+            return False
+    identity = _table_identity(table_path, version)
+    with DATA_DICT_LOCK:
+        if key not in DATA_DICT or DATA_DICT[key + " - Version"][0] != identity:
+            return False
+        TABLE_STATS[key] = version
+    print(f"Data Table unchanged -- [{os.path.basename(table_path)}]")
+    return True
 
-    if need_load:
-        # build outside lock if you want, but simplest is just load here
-        with DATA_DICT_LOCK:
-            load_to_DATA_DICT(table_path)
 
-    # VPS cache (guarded)
+def _get_df(project_name):
+    table_path = _table_path(project_name)
+    table_name = _table_key(table_path)
+
+    # VPS cache (guarded) -- loaded first, the table load needs its reserving class columns
     with VPS_DICT_LOCK:
         if project_name not in VPS_DICT:
             load_to_VPS_DICT(project_name)
 
-    return DATA_DICT[table_name]
+    source_version = CHANGE_TRACKER.version(table_path)
+
+    # With apps.agent.column_projection only the columns the project reads are loaded
+    vps_index = _vps_index(project_name)
+    schema = _table_schema(vps_index)
+    columns = tuple(schema) if get_config_value('apps.agent.column_projection', True) else None
+
+    # DATA table cache (guarded); one load per table, other tables are not blocked
+    while True:
+        with DATA_DICT_LOCK:
+            _touch_table(table_name)
+            need_load = (table_name not in DATA_DICT) or (TABLE_STATS.get(table_name) != source_version)
+            missing = [] if need_load else _missing_columns(table_name, columns)
+            if not need_load and not missing:
+                return DATA_DICT[table_name]
+            if columns is not None and table_name in DATA_DICT:
+                # A reload keeps the columns other projects on the same table added
+                columns = tuple(dict.fromkeys(columns + tuple(DATA_DICT[table_name].columns)))
+
+            load = TABLE_LOADS.get(table_name)
+            is_loader = load is None
+            if is_loader:
+                load = TABLE_LOADS[table_name] = _TableLoad()
+
+        if is_loader:
+            break
+
+        # Another request is loading this table: wait for it, then re-check
+        load.done.wait()
+        if load.error is not None:
+            raise load.error
+
+    rsv_cls_col_names = vps_index.rsv_cls_col_names
+    try:
+        # Missing columns are added and appended rows (e.g. a new valuation month) merged in;
+        # any other change reloads the table
+        updated = False
+        try:
+            if missing:
+                updated = add_columns_to_DATA_DICT(table_path, missing, rsv_cls_col_names, schema)
+            else:
+                # An append is checked first: it never hashes the whole file
+                if get_config_value('apps.agent.incremental_refresh', True):
+                    updated = append_to_DATA_DICT(table_path, rsv_cls_col_names, schema)
+                if not updated:
+                    updated = _restamp_table(table_path, source_version)
+        except Exception as e:
+            print(f"Error updating Data Table [{os.path.basename(table_path)}]: {e}")
+        if not updated:
+            load_to_DATA_DICT(table_path, rsv_cls_col_names, schema, columns)
+    except Exception as e:
+        load.error = e
+        raise
+    finally:
+        with DATA_DICT_LOCK:
+            TABLE_LOADS.pop(table_name, None)
+            df, version = DATA_DICT.get(table_name), DATA_DICT.get(table_name + " - Version")
+        load.done.set()
+
+    # Optional pre-aggregated cube, built off the request path (unless appended rows were merged into it)
+    if get_config_value('apps.agent.loss_cube', False) and table_name not in TABLE_SCANS:
+        with CUBE_DICT_LOCK:
+            cube_version = CUBE_DICT.get(table_name, {}).get('version')
+        if cube_version != version:
+            key_cols = [c for c in vps_index.date_cols if c != ''] + rsv_cls_col_names
+            build_loss_cube_in_thread(table_name, version, df, key_cols)
+
+    return df
 
 
 def _get_dataset_info(arg):
@@ -709,26 +2344,18 @@ def _get_dataset_info(arg):
     dataset_name = arg['DatasetName']
 
     df = _get_df(project_name)
+    vps_index = _vps_index(project_name)
 
     # Set user defined name (ResQ) to actual SQL table col names
-    df_info = VPS_DICT[project_name]['Dataset Types']
-    
-    if dataset_name in df_info['Name'].values:
-        source = df_info.loc[df_info['Name'] == dataset_name, 'Source'].iloc[0]
-    else:
+    if dataset_name not in vps_index.datasets:
         write_lists_to_csv(arg['DataPath'], [[f'(dataset name not defined: {dataset_name})']])
         return
-    
-    output_data_format = df_info.loc[df_info['Name'] == dataset_name, 'Data Format'].iloc[0]
 
-    # find all required table and column names
-    df_info = VPS_DICT[project_name]['Source Table']
-    required_datasets = split_formula(source)
-    rsv_cls_col_names = df_info.loc[df_info['Significances'].isin(['Reserving Class']), 'Column Name'].unique().tolist()
+    source, output_data_format, required_datasets = vps_index.datasets[dataset_name]
 
-    date_cols = []
-    date_cols.append(DLOOKUP(df_info, 'Origin Date', 'Significances', 'Column Name'))
-    date_cols.append(DLOOKUP(df_info, 'Development Date', 'Significances', 'Column Name'))
+    # find all required table and column names
+    rsv_cls_col_names = vps_index.rsv_cls_col_names
+    date_cols = list(vps_index.date_cols)
 
     # Load project-specific date settings (with fallback to data-derived values)
     project_settings = _load_project_settings(project_name, df, date_cols)
@@ -738,89 +2365,63 @@ def _get_dataset_info(arg):
     required_datasets = list(set(required_datasets))                       # remove duplicates
 
     # determine the categorical values need to be included/adjusted in the calculation
-    df_info = VPS_DICT[project_name]['Reserving Class Types']
-    name_lookup = {str(v).lower(): v for v in df_info['Name'].dropna()}
-    splited_path = path.split('\\')
-    included_rsv_cls_types = []  # use original value
-    excluded_rsv_cls_types = []  # use negative value
-    adjusted_rsv_cls_types = []  # change values to zero for EEX calculations
-
-    level = 1
-    for rsv_cls_type in splited_path:  # loop through N levels of reserving class
-        if level > len(rsv_cls_col_names):
-            break
-        rsv_cls_type = name_lookup[rsv_cls_type.lower()]
-        # print(f"Processing RSV CLS Type [{rsv_cls_type}] at Level {level} for dataset [{dataset_name}]")
-        included_rsv_cls_types.append([])
-        excluded_rsv_cls_types.append([])
-        adjusted_rsv_cls_types.append([])
-
-        if rsv_cls_type in df_info['Name'].values:
-            included_rsv_cls_types[level-1].append(rsv_cls_type) # always include the input value itself
-            # Also include Source-derived values for data matching (handles name aliases like "New" -> "N")
-            type_source = df_info.loc[df_info['Name'] == rsv_cls_type, 'Source'].iloc[0]
-            if type_source != '':
-                src_names = split_formula(type_source)
-                # print(f"  Source for [{rsv_cls_type}]: {src_names}")
-                src_opts = split_formula_opts(type_source)
-                for si in range(len(src_names)):
-                    if src_opts[si] == '-' and src_names[si] not in excluded_rsv_cls_types[level-1]:
-                        excluded_rsv_cls_types[level-1].append(src_names[si])
-                    if src_names[si] not in included_rsv_cls_types[level-1]:
-                        included_rsv_cls_types[level-1].append(src_names[si])
-
-            formula     = df_info.loc[df_info['Name'] == rsv_cls_type, 'Formula'].iloc[0]
-            # Safely access EEX Formula column — handle missing column or empty result
-            eex_formula = ''
-            if 'EEX Formula' in df_info.columns:
-                result = df_info.loc[df_info['Name'] == rsv_cls_type, 'EEX Formula']
-                if not result.empty:
-                    eex_formula = result.iloc[0]
-
-            if formula == '':
-                pass
-            else:
-                if eex_formula != '':
-                    # Adjusted = all members at this level NOT in eex_formula (not dependent on formula)
-                    all_members = df_info[df_info['Level'] == str(level)]['Name'].tolist()
-                    adjusted_rsv_cls_types_level_x = list(set(all_members) - set(split_formula(eex_formula)))
-                    adjusted_rsv_cls_types[level-1] = adjusted_rsv_cls_types_level_x
+    included_rsv_cls_types, excluded_rsv_cls_types, adjusted_rsv_cls_types = vps_index.resolve_path(path)
 
-                name_list = split_formula(formula)
-                opts_list = split_formula_opts(formula)
+    return df, date_cols, required_datasets, rsv_cls_col_names, \
+           included_rsv_cls_types, excluded_rsv_cls_types, adjusted_rsv_cls_types, \
+           source, output_data_format, max_sys_yrmo
 
-                for i in range(len(name_list)):
-                    name = name_list[i]
-                    opt = opts_list[i]
-                    if opt == '-':
-                        excluded_rsv_cls_types[level-1].append(name)
-                    included_rsv_cls_types[level-1].append(name)
-        elif rsv_cls_type == '':
-            pass
-        else: 
-            write_lists_to_csv(arg['DataPath'], [[f'(reserving class type not defined: {rsv_cls_type})']])
-            # print(f"(reserving class type not defined: {rsv_cls_type})")
-            return
 
-        level += 1
+def _result_cache_key(arg):
+    """
+    Cache key of a request: its arguments plus the versions of every input it reads.
+    Table, VPS and project settings are (re)loaded first so the key sees current versions.
+    """
+    project_name = arg['ProjectName']
+    df = _get_df(project_name)
+    _load_project_settings(project_name, df, list(_vps_index(project_name).date_cols))
+    table_name = _table_key(_table_path(project_name))
+
+    return (
+        arg['Function'], project_name, arg.get('Path'), arg.get('DatasetName'), arg.get('Cumulative'),
+        arg.get('OriginLength'), arg.get('DevelopmentLength'), arg.get('periodType'), arg.get('PeriodLength'),
+        DATA_DICT.get(table_name + " - Version"),
+        VPS_DICT.get(project_name + " - Version"),
+        PROJECT_SETTINGS_VERSION.get(project_name),
+    )
 
-    included_rsv_cls_types = [list(set(sublist)) for sublist in included_rsv_cls_types]
-    excluded_rsv_cls_types = [list(set(sublist)) for sublist in excluded_rsv_cls_types]
-    adjusted_rsv_cls_types = [list(set(sublist)) for sublist in adjusted_rsv_cls_types]
 
-    return df, date_cols, required_datasets, rsv_cls_col_names, \
-           included_rsv_cls_types, excluded_rsv_cls_types, adjusted_rsv_cls_types, \
-           source, output_data_format, max_sys_yrmo
+def _result_cache_get(key):
+    with RESULT_CACHE_LOCK:
+        result = RESULT_CACHE.get(key)
+        if result is None:
+            RESULT_CACHE_STATS['misses'] += 1
+            return None
+        RESULT_CACHE.move_to_end(key)
+        RESULT_CACHE_STATS['hits'] += 1
+    print("> result cache hit")
+    return result
+
+
+def _result_cache_put(key, result):
+    max_size = get_config_value('apps.agent.result_cache_size', 512)
+    with RESULT_CACHE_LOCK:
+        RESULT_CACHE[key] = result
+        RESULT_CACHE.move_to_end(key)
+        while len(RESULT_CACHE) > max_size:
+            RESULT_CACHE.popitem(last=False)
+
+
+def result_cache_status():
+    with RESULT_CACHE_LOCK:
+        return f"{RESULT_CACHE_STATS['hits']} hits / {RESULT_CACHE_STATS['misses']} misses / {len(RESULT_CACHE)} entries"
 
 
 def UDF_ADASProjectSettings(arg):
     project_name = arg['ProjectName']
     df = _get_df(project_name)
 
-    df_info = VPS_DICT[project_name]['Source Table']
-    date_cols = []
-    date_cols.append(DLOOKUP(df_info, 'Origin Date', 'Significances', 'Column Name'))
-    date_cols.append(DLOOKUP(df_info, 'Development Date', 'Significances', 'Column Name'))
+    date_cols = list(_vps_index(project_name).date_cols)
 
     # Load project-specific date settings (with fallback to data-derived values)
     project_settings = _load_project_settings(project_name, df, date_cols)
@@ -842,6 +2443,15 @@ def UDF_ADASProjectSettings(arg):
 
 
 def UDF_ADASHeaders(arg):
+    key = _result_cache_key(arg)
+    data_list = _result_cache_get(key)
+    if data_list is None:
+        data_list = _compute_ADASHeaders(arg)
+        _result_cache_put(key, data_list)
+    write_lists_to_csv(arg['DataPath'], data_list)
+
+
+def _compute_ADASHeaders(arg):
     # Calculate Age & Origin Labels
     project_name = arg['ProjectName']
     org_len = int(arg['PeriodLength'])
@@ -849,10 +2459,7 @@ def UDF_ADASHeaders(arg):
     period_type = int(arg['periodType'])
 
     df = _get_df(project_name)
-    df_info = VPS_DICT[project_name]['Source Table']
-    date_cols = []
-    date_cols.append(DLOOKUP(df_info, 'Origin Date', 'Significances', 'Column Name'))
-    date_cols.append(DLOOKUP(df_info, 'Development Date', 'Significances', 'Column Name'))
+    date_cols = list(_vps_index(project_name).date_cols)
 
     # Load project-specific date settings (with fallback to data-derived values)
     project_settings = _load_project_settings(project_name, df, date_cols)
@@ -869,7 +2476,7 @@ def UDF_ADASHeaders(arg):
 
         org_label = [_get_org_label(i[0], org_len) for i in org_index_grp]
 
-        return write_lists_to_csv(arg['DataPath'], [org_label])
+        return [org_label]
     
     elif period_type == 1: # Development Period
 
@@ -895,10 +2502,10 @@ def UDF_ADASHeaders(arg):
                 break
 
         dev_label = list(map(lambda x:f"{x}m", dev_label))
-        return write_lists_to_csv(arg['DataPath'], [dev_label])
+        return [dev_label]
     
     else:
-        return write_lists_to_csv(arg['DataPath'], [['(invalid input: periodType)']])
+        return [['(invalid input: periodType)']]
 
 
 def _filter_main_table(df, date_cols, rsv_cls_col_names, included_rsv_cls_types, required_datasets):
@@ -923,13 +2530,13 @@ def _filter_main_table(df, date_cols, rsv_cls_col_names, included_rsv_cls_types,
         included_rsv_cls_types = included_rsv_cls_types + [''] * (fixed_levels-input_levels)
 
     # Start with full mask
-    mask = True
+    mask = np.ones(len(df), dtype=bool)
 
-    # Add filters dynamically
+    # Add filters dynamically (integer code lookups for categorical columns)
     for col, allowed_values in zip(rsv_cls_col_names, included_rsv_cls_types):
         # If empty list → skip filter for this level
         if allowed_values:
-            mask &= df[col].isin(allowed_values)
+            mask &= _isin_mask(df[col], allowed_values)
 
     # Build final column list (filter out empty date_cols when Development Date is not defined)
     cols = [c for c in date_cols if c != ''] + rsv_cls_col_names + required_datasets
@@ -938,18 +2545,144 @@ def _filter_main_table(df, date_cols, rsv_cls_col_names, included_rsv_cls_types,
 
 
 def UDF_ADASTri(arg):
-    org_len = arg['OriginLength']
-    dev_len = arg['DevelopmentLength']
-    cumulative = arg['Cumulative']
-    project_name = arg['ProjectName']
+    tri_arg = _triangle_arg(arg)
+    key = _result_cache_key(tri_arg)
+    df2 = _result_cache_get(key)
+    if df2 is None:
+        df2 = _compute_ADASTri(tri_arg)
+        _result_cache_put(key, df2)
+
+    # Output
+    _export_dataframe(_slice_triangle(df2, arg), arg)
+
+
+def _triangle_arg(arg):
+    # ADASTriDiag/Cell/Origin read the same triangle (and result cache entry) as ADASTri
+    if arg['Function'] in TRIANGLE_SLICES:
+        return dict(arg, Function='ADASTri')
+    return arg
+
+
+def _triangle_diagonal(df, arg):
+    """
+    Diagonal of a triangle as an (origins x 1) column, as ADASTriDiag did with VBA GetDiagonal
+    (which it called with -DiagonalIndex): per origin the last non-empty value, or with
+    DiagonalIndex = -k the (k+1)-th last; positive indices read as 0; 0 if there is none.
+    """
+    target = max(-int(arg.get('DiagonalIndex', 0)), 0) + 1
+    values = df.to_numpy(dtype=float)[:, ::-1]
+    present = ~np.isnan(values)
+    hit = present & (np.cumsum(present, axis=1) == target)
+    col = hit.argmax(axis=1)
+    diagonal = np.where(hit.any(axis=1), values[np.arange(len(values)), col], 0.0)
+    return pd.DataFrame(diagonal, index=df.index, columns=['Diagonal'])
+
+
+def _triangle_cell(df, arg):
+    # OriginPeriod / DevelopmentPeriod are 1-based
+    origin, dev = int(arg['OriginPeriod']), int(arg['DevelopmentPeriod'])
+    if not (1 <= origin <= df.shape[0] and 1 <= dev <= df.shape[1]):
+        raise IndexError(f"cell out of range: ({origin}, {dev})")
+    return df.iloc[[origin - 1], [dev - 1]]
+
+
+def _triangle_origin(df, arg):
+    # One origin row (1 x devs); OriginPeriod is 1-based
+    origin = int(arg['OriginPeriod'])
+    if not 1 <= origin <= df.shape[0]:
+        raise IndexError(f"origin out of range: {origin}")
+    return df.iloc[[origin - 1], :]
+
+
+TRIANGLE_SLICES = {
+    'ADASTriDiag': _triangle_diagonal,
+    'ADASTriCell': _triangle_cell,
+    'ADASTriOrigin': _triangle_origin,
+}
+
+
+def _slice_triangle(df, arg):
+    # Only the requested part of the triangle is published for the slice functions
+    slicer = TRIANGLE_SLICES.get(arg['Function'])
+    return df if slicer is None else slicer(df, arg)
+
+
+def UDF_ADASTri_group(args):
+    """
+    ADASTri/ADASVec (and ADASTriDiag/Cell/Origin) for requests coalesced by RequestCoalescer
+    (same project, path and lengths).
+    Cached results are reused; the rest share one filter / bucketing pass.
+    A request that fails on its own gets the usual [[0]] output, the others still complete.
+    """
+    tri_args = [_triangle_arg(arg) for arg in args]
+    keys = [_result_cache_key(arg) for arg in tri_args]
+    results = [_result_cache_get(key) for key in keys]
+
+    # Slices of one triangle (e.g. several ADASTriCell calls) compute it once
+    missing = OrderedDict()
+    for i, result in enumerate(results):
+        if result is None:
+            missing.setdefault(keys[i], []).append(i)
+    if missing:
+        computed = _compute_ADASTri_group([tri_args[positions[0]] for positions in missing.values()])
+        for (key, positions), result in zip(missing.items(), computed):
+            if not isinstance(result, Exception):
+                _result_cache_put(key, result)
+            for i in positions:
+                results[i] = result
+
+    for arg, result in zip(args, results):
+        try:
+            if isinstance(result, Exception):
+                raise result
+            _export_dataframe(_slice_triangle(result, arg), arg)
+        except Exception as e:
+            print(f"(error: {str(e).upper()})")
+            write_lists_to_csv(arg['DataPath'], [[0]])
+
+
+def _compute_ADASTri(arg):
+    result = _compute_ADASTri_group([arg])[0]
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def _compute_ADASTri_group(args):
+    """
+    Compute ADASTri/ADASVec results for requests sharing ProjectName, Path, OriginLength
+    and DevelopmentLength. The filter, sign adjustments and bucketing depend only on those,
+    so they run once over the union of the requested datasets; each request then only
+    evaluates its formula and the clean format step.
+
+    Returns one entry per request: the result DataFrame, or the exception it raised.
+    """
+    org_len = args[0]['OriginLength']
+    dev_len = args[0]['DevelopmentLength']
+    project_name = args[0]['ProjectName']
 
     # initialize
     if org_len == 'Default': org_len = 12
 
-    # Get a subset dataframe based on a user's request
-    df, date_cols, required_datasets, rsv_cls_col_names, \
+    # Get a subset dataframe based on each user's request
+    infos = []
+    for arg in args:
+        try:
+            info = _get_dataset_info(arg)
+            if info is None:  # message already written to DataPath
+                raise ValueError(f"invalid request: {arg['DatasetName']} @ {arg['Path']}")
+            infos.append(info)
+        except Exception as e:
+            infos.append(e)
+
+    valid_infos = [info for info in infos if not isinstance(info, Exception)]
+    if not valid_infos:
+        return infos
+
+    df, date_cols, _, rsv_cls_col_names, \
     included_rsv_cls_types, excluded_rsv_cls_types, adjusted_rsv_cls_types, \
-    source, output_data_format, max_sys_yrmo = _get_dataset_info(arg)
+    _, _, max_sys_yrmo = valid_infos[0]
+    required_datasets = list(dict.fromkeys(c for info in valid_infos for c in info[2]))
 
     # Load project-specific date settings (with fallback to data-derived values)
     # Note: _get_dataset_info already loads settings, but we reload here for local use
@@ -957,6 +2690,19 @@ def UDF_ADASTri(arg):
 
     max_sys_month = max_sys_yrmo % 100
 
+    # Answer from the pre-aggregated loss cube when it covers this request
+    table_name = _table_key(_table_path(project_name))
+    key_cols = [c for c in date_cols if c != ''] + rsv_cls_col_names
+    cube = _get_loss_cube(table_name, key_cols, required_datasets)
+    with DATA_DICT_LOCK:
+        scan_path = TABLE_SCANS.get(table_name)
+    if cube is not None:
+        df = cube
+    elif scan_path is not None:
+        # Non-resident columnar table: read just the needed columns of the rows this Path includes
+        df = _scan_table(scan_path, key_cols + required_datasets, rsv_cls_col_names,
+                         rsv_cls_col_names, included_rsv_cls_types)
+
     df1 = _filter_main_table(df, date_cols, rsv_cls_col_names, included_rsv_cls_types, required_datasets)
 
     # Check if Development Date column is missing (optional when not in field_mapping)
@@ -970,18 +2716,23 @@ def UDF_ADASTri(arg):
     num_cols = df1.select_dtypes(include=[np.number]).columns
     dataset_cols = [col for col in num_cols if col not in date_cols]  # all numerical field need to be adjusted
 
+    # A row excluded at two levels flips twice, same as flipping level by level
+    sign = np.ones(len(df1), dtype=np.int8)
     for i in range(len(excluded_rsv_cls_types)):
         excluded_rsv_cls_types_level_x = excluded_rsv_cls_types[i]
         if excluded_rsv_cls_types_level_x == []: 
             continue
-        for value in excluded_rsv_cls_types_level_x:
-            df1.loc[df1[rsv_cls_col_names[i]].isin([value]), dataset_cols] *= -1
+        sign[_isin_mask(df1[rsv_cls_col_names[i]], excluded_rsv_cls_types_level_x)] *= -1
+
+    flipped = sign < 0
+    if flipped.any():
+        df1.loc[flipped, dataset_cols] *= -1
 
     # Row Adjustments (EEX aggregation) -- set value to 0
     if 'Earned_Exposure' in required_datasets:
         adjusted_rsv_cls_types_level_x = adjusted_rsv_cls_types[4]  # level 5: IBNRCAT
-        for value in adjusted_rsv_cls_types_level_x:
-            df1.loc[df1[rsv_cls_col_names[4]].isin([value]), ['Earned_Exposure']] *= 0
+        if adjusted_rsv_cls_types_level_x:
+            df1.loc[_isin_mask(df1[rsv_cls_col_names[4]], adjusted_rsv_cls_types_level_x), ['Earned_Exposure']] *= 0
 
     # Prepare for grouping by origin period and development age
     if (dev_len == 'Default') or (org_len % dev_len != 0):
@@ -1002,7 +2753,6 @@ def UDF_ADASTri(arg):
         dev_year = dev_end // 100
         dev_month = dev_end % 100
         # Convert YYYYMM to MMM YYYY format (e.g., 202603 -> Mar 2026)
-        import calendar
         month_abbr = calendar.month_abbr[dev_month]
         dev_label = [f"{month_abbr} {dev_year}"]
     else:
@@ -1019,117 +2769,256 @@ def UDF_ADASTri(arg):
     org_index_grp = [tuple(acc_yrmo_all[i: i+org_step]) for i in range(0, len(acc_yrmo_all), org_step)]
     org_index_map = {val: group[0] for group in org_index_grp for val in group}
     org_label = [_get_org_label(i[0], org_len) for i in org_index_grp]
-    
-    df1['Org*Grp'] = df1[date_cols[0]].apply(lambda x: _get_org_label(x, org_len))
 
-    df1['Org*Start'] = df1[date_cols[0]].map(org_index_map)
-    # When Development Date is missing, use dev_end from config for Age* (single column triangle)
-    if has_dev_date:
-        df1['Age*'] = df1[['Org*Start', date_cols[1]]].apply(lambda row: _calc_age(row.iloc[0], row.iloc[1]), axis=1)
-    else:
-        df1['Age*'] = df1['Org*Start'].apply(lambda x: _calc_age(x, project_settings['dev_end']))
+    legacy_bucketing = get_config_value('apps.agent.legacy_bucketing', False)
+    if not legacy_bucketing:
+        tri_cube = _triangle_cube(df1, date_cols, has_dev_date, org_len, org_index_map, org_label, dev_label,
+                              required_datasets)
 
-    # When Development Date is missing (single column), all rows map to the single dev_label value
-    if not has_dev_date:
-        df1['Age*Grp'] = dev_label[0]  # Single column: all rows get the same label
-    else:
-        df1['Age*Grp'] = df1['Age*'].apply(lambda x: min([i for i in dev_label if i >= x]))
+    triangles_by_cumulative = {}  # (triangles, formula memo), built at most once per Cumulative value
 
-    df1 = df1.groupby(['Org*Grp', 'Age*Grp'])[required_datasets].sum().reset_index()
+    results = []
+    for arg, info in zip(args, infos):
+        if isinstance(info, Exception):
+            results.append(info)
+            continue
 
-    # Create individual non-calculated triangles
-    triangles  = {}
-    
-    for name in required_datasets:
-        df2 = df1.pivot_table(
-            index = df1['Org*Grp'], 
-            columns = df1['Age*Grp'], 
-            values = name,
-            aggfunc = 'sum', 
-            fill_value = 0
-        )
-        df2 = df2.reindex(index=org_label, columns=dev_label).fillna(0)
+        cumulative = arg['Cumulative'] == True
+        source, output_data_format = info[7], info[8]
+        try:
+            if cumulative not in triangles_by_cumulative:
+                if legacy_bucketing:
+                    triangles = _triangles_legacy(
+                        df1, date_cols, has_dev_date, org_len, org_index_map, org_label, dev_label,
+                        project_settings['dev_end'], required_datasets, cumulative, project_name)
+                else:
+                    triangles = _cube_to_triangles(np.cumsum(tri_cube, axis=2) if cumulative else tri_cube,
+                                                   required_datasets, project_name)
+                triangles_by_cumulative[cumulative] = (triangles, {})
+
+            triangles, memo = triangles_by_cumulative[cumulative]
+            results.append(_finish_ADASTri(triangles, memo, arg, source, output_data_format,
+                                           org_len, dev_len, max_sys_month, org_label, dev_label))
+        except Exception as e:
+            results.append(e)
 
-        if cumulative == True: 
-            df2 = df2.cumsum(axis=1)
+    return results
 
-        data_format = DLOOKUP(VPS_DICT[arg['ProjectName']]['Dataset Types'], name, 'Source', 'Data Format')
-        if data_format == 'Vector':
-            df2 = vector_to_triangle(df2.iloc[:, [0]], dev_label)
 
-        triangles[name] = df2
-    
-    # Calculated Triangle
-    df2 = eval_triangle_formula(triangles, source)  
+@lru_cache(maxsize=256)
+def _clean_format_mask(n_origins, n_devs, org_len, dev_len, max_sys_month):
+    """
+    Boolean (origins x devs) mask of the cells beyond each origin's evaluation date,
+    which the Clean Format step blanks out. Read-only; memoized per triangle layout.
+    """
+    max_dev_age = (n_origins - np.arange(n_origins)) * int((org_len/dev_len))
 
-    # Clean Format
-    n_rows = df2.shape[0]
+    # if org_len == 3 and dev_len == 1:
+    if dev_len == 1:
+        max_dev_age -= 12 - max_sys_month
 
-    for i, acc in enumerate(df2.index):
-        max_dev_age = (n_rows - i) * int((org_len/dev_len))
-        
-        # if org_len == 3 and dev_len == 1:
-        if dev_len == 1:
-            max_dev_age = max_dev_age - (12 - max_sys_month)
+    if dev_len == 3:
+        if max_sys_month in [1, 2, 3]:
+            max_dev_age -= 3
+        elif max_sys_month in [4, 5, 6]:
+            max_dev_age -= 2
+        elif max_sys_month in [7, 8, 9]:
+            max_dev_age -= 1
+
+    if dev_len == 6 and max_sys_month <= 6:
+        max_dev_age -= 1
 
-        if dev_len == 3:
-            if max_sys_month in [1, 2, 3]:
-                max_dev_age = max_dev_age - 3
-            elif max_sys_month in [4, 5, 6]:
-                max_dev_age = max_dev_age - 2
-            elif max_sys_month in [7, 8, 9]:
-                max_dev_age = max_dev_age - 1
+    max_dev_age = np.maximum(max_dev_age, 0)
 
-        if dev_len == 6 and max_sys_month <= 6:
-            max_dev_age = max_dev_age - 1
+    mask = np.arange(n_devs)[None, :] >= max_dev_age[:, None]
+    mask.flags.writeable = False
+    return mask
 
-        if max_dev_age < 0:
-            max_dev_age = 0
 
-        df2.loc[acc, dev_label[max_dev_age:]] = np.nan
+def _finish_ADASTri(triangles, memo, arg, source, output_data_format, org_len, dev_len, max_sys_month,
+                    org_label, dev_label):
+    # Calculated Triangle
+    values = eval_triangle_formula(triangles, source, (len(org_label), len(dev_label)), memo=memo)
+
+    # Clean Format
+    values[_clean_format_mask(len(org_label), len(dev_label), org_len, dev_len, max_sys_month)] = np.nan
+    df2 = pd.DataFrame(values, index=org_label, columns=dev_label, copy=False)
 
     if output_data_format == 'Vector' or arg['Function'] == 'ADASVec':
         df2 = df2.iloc[:, [0]]
 
-    # Output
-    _export_dataframe(df2, arg)
+    return df2
 
 
 def _export_dataframe(df, arg):
+    """
+    Publish a result as CSV (read by VBA GetDataset) and, for the web app, as a binary .tri
+    next to it: when the request asks for it (BinaryOutput = True, set by the app and on RPC
+    requests) or apps.agent.binary_output is on. Excel requests write only the CSV.
+    The .tri is replaced after the CSV, so until then the previous one is older than the
+    CSV; readers must ignore a .tri older than its CSV (see read_triangle_binary in the app).
+    """
     data_path = arg['DataPath']
-    file_name = os.path.basename(data_path)
-    folder = os.path.dirname(data_path)
-    tmp_folder = folder + '\\tmp'
-    tmp_data_path = tmp_folder + '\\' + file_name
-    
-    try:
-        if not os.path.exists(folder):
-            os.makedirs(folder)
-        if not os.path.exists(tmp_folder):
-            os.makedirs(tmp_folder)
-    except:
-        pass
+    _publish_output(data_path, lambda tmp_path: df.to_csv(tmp_path, index=False, header=False))
+
+    if arg.get('BinaryOutput') is True or get_config_value('apps.agent.binary_output', False):
+        _publish_output(_binary_output_path(data_path), lambda tmp_path: _write_triangle_binary(tmp_path, df))
+
+
+def _job_args(job):
+    # A job is one request (arg dict) or a coalesced group of them (list)
+    return job if isinstance(job, list) else [job]
+
+
+class RequestCoalescer:
+    """
+    Collects requests for a short window after the first one arrives (apps.agent.coalesce_ms),
+    then hands them on. ADASTri/ADASVec/ADASTriDiag/Cell/Origin requests with the same ProjectName,
+    Path, OriginLength and DevelopmentLength are handed on together as one group; everything else
+    goes on alone.
+
+    Every request waits out the window, including a single interactive one with nothing to
+    group with, so coalescing is off unless apps.agent.coalesce_ms is set (e.g. 20 for a
+    workbook recalculating many triangles of the same segment at once).
+    """
+    def __init__(self, dispatch, window):
+        self.dispatch = dispatch
+        self.window = window
+        self.lock = Lock()
+        self.requests = []
+        self.timer = None
+
+    def add(self, arg):
+        with self.lock:
+            self.requests.append(arg)
+            if self.timer is None:
+                self.timer = threading.Timer(self.window, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            requests, self.requests, self.timer = self.requests, [], None
+
+        jobs = group_requests(requests)
+        if len(requests) > len(jobs):
+            print(f"\n> coalesced {len(requests)} requests into {len(jobs)} jobs")
+
+        for job in jobs:
+            self.dispatch(job)
+
+
+def group_requests(requests):
+    """
+    Jobs for a list of requests, in arrival order: ADASTri/ADASVec/ADASTriDiag/Cell/Origin
+    requests with the same ProjectName, Path, OriginLength and DevelopmentLength become one
+    group (a list); every other request is a job on its own.
+    """
+    jobs = OrderedDict()
+    for i, arg in enumerate(requests):
+        if arg.get('Function') in ['ADASTri', 'ADASVec', *TRIANGLE_SLICES]:
+            key = (arg['ProjectName'], arg.get('Path'), arg.get('OriginLength'), arg.get('DevelopmentLength'))
+        else:
+            key = i
+        jobs.setdefault(key, []).append(arg)
+
+    return [group if len(group) > 1 else group[0] for group in jobs.values()]
 
-    df.to_csv(tmp_data_path, index=False, header=False)
 
-    if os.path.exists(data_path):
-        os.remove(data_path)
+class RequestPool:
+    """
+    Bounded pool of worker threads that run requests picked up by the watchdog thread.
+    Requests of projects listed in apps.agent.ordered_projects (or all projects if it
+    is true) run one at a time in arrival order; other requests run in any order.
+    """
+    def __init__(self, handler, workers):
+        self.handler = handler
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="request")
+        self.lock = Lock()
+        self.pending = 0          # queued + running requests
+        self.project_queues = {}  # ordered project -> requests waiting behind the running one
+
+    def _is_ordered(self, project_name):
+        ordered_projects = get_config_value('apps.agent.ordered_projects', [])
+        return ordered_projects is True or project_name in (ordered_projects or [])
+
+    def submit(self, job):
+        project_name = _job_args(job)[0].get('ProjectName')
+        ordered = self._is_ordered(project_name)
+
+        with self.lock:
+            self.pending += len(_job_args(job))
+            if ordered:
+                if project_name in self.project_queues:
+                    self.project_queues[project_name].append(job)
+                    return
+                self.project_queues[project_name] = deque()
+
+        if ordered:
+            self.executor.submit(self._drain, project_name, job)
+        else:
+            self.executor.submit(self._run, job)
+
+    def _drain(self, project_name, job):
+        # Run one ordered project's requests back to back on this worker
+        while job is not None:
+            self._run(job)
+            with self.lock:
+                queue = self.project_queues[project_name]
+                if queue:
+                    job = queue.popleft()
+                else:
+                    del self.project_queues[project_name]
+                    job = None
+
+    def _run(self, job):
+        try:
+            self.handler.run_job(job)
+        except Exception as e:
+            print(e)
+        finally:
+            with self.lock:
+                self.pending -= len(_job_args(job))
 
-    os.rename(tmp_data_path, data_path)
+    def queue_depth(self):
+        with self.lock:
+            return self.pending
 
 
 class RequestHandler(FileSystemEventHandler):
 
+    def __init__(self, pool_size=1, coalesce_ms=0):
+        super().__init__()
+        self.pool = RequestPool(self, pool_size) if pool_size > 1 else None
+        self.coalescer = RequestCoalescer(self.dispatch, coalesce_ms / 1000) if coalesce_ms > 0 else None
+
     def on_moved(self, event):
         if event.is_directory:
             return
         if not event.dest_path.lower().endswith(".txt"):
             return
 
-        file_path = event.dest_path
+        self.accept_request(event.dest_path)
+
+    def accept_request(self, file_path):
+        # The watchdog event thread only picks the request up; it runs on the worker pool
+        args = self.take_request(file_path)
+        if self.coalescer is None:
+            # The calls of a batch file share loading and filtering like coalesced requests
+            for job in group_requests(args):
+                self.dispatch(job)
+        else:
+            for arg in args:
+                self.coalescer.add(arg)
+
+    def dispatch(self, job):
+        if self.pool is None:
+            self.run_job(job)
+        else:
+            self.pool.submit(job)
 
-        # Process request immediately in the watchdog event thread
-        self.process_file(file_path)
+    def queue_depth(self):
+        return 0 if self.pool is None else self.pool.queue_depth()
         
     def process_file_debug(self, file_path):
         if debug_mode == 0:
@@ -1142,41 +3031,124 @@ class RequestHandler(FileSystemEventHandler):
 
 
     def process_file(self, file_path):
-        try:
-            arg = convert_dict(read_txt(file_path))
-        except:
+        for job in group_requests(self.take_request(file_path)):
+            self.run_job(job)
+
+    def take_request(self, file_path):
+        """
+        Claim, read and remove a request file. Returns the argument dicts to run: one for
+        a plain request file, one per call for a batch file (see read_request_txt), none if
+        there is nothing to run. Agents that lose the claim do no other work.
+        """
+        claimed_path = claim_request(file_path)
+        if claimed_path is None:
             # print(f'\n* request sent to another agent')
-            return
+            return []
+        if claimed_path == CLAIM_BUSY:
+            # Still held open: leave it in place and try to claim it again shortly
+            print(f"Request still in use, retrying [{os.path.basename(file_path)}]")
+            retry = threading.Timer(CLAIM_RETRY_SECONDS, self.accept_request, args=(file_path,))
+            retry.daemon = True
+            retry.start()
+            return []
 
         try:
-            project_name = arg['ProjectName']
-            DLOOKUP(BASE_DICT['Project Map'], project_name, 'Project Name', 'Table Path')
-        except:
-            write_lists_to_csv(arg['DataPath'], [[f'(project not found: {project_name})']])
-            return
+            args = [convert_dict(arg) for arg in read_request_txt(claimed_path)]
+        except Exception as e:
+            print(f"Error reading request [{os.path.basename(file_path)}]: {e}")
+            args = []
 
-        try:
-            safe_remove(file_path)
-        except: # Already removed by another agent
-            return
+        if not safe_remove(claimed_path):
+            print(f"Error removing claimed request [{os.path.basename(claimed_path)}]")
 
-        if debug_mode == 1:
-            print(arg)
+        if len(args) > 1:
+            print(f"\n> batch of {len(args)} requests [{os.path.basename(file_path)}]")
 
-        print(f"\n> {get_current_time()} \n> new request # {robot_id} # user [{arg['UserName']}]")
+        return [arg for arg in args if self.check_request(arg)]
 
+    def check_request(self, arg):
+        """
+        Check the request's project exists and its table can be read; if not, write the error to its DataPath.
+        """
+        try:
+            table_path = BASE_DICT['Table Paths'][arg['ProjectName']]
+        except:
+            write_lists_to_csv(arg['DataPath'], [[f"(project not found: {arg.get('ProjectName')})"]])
+            return False
+        if pa_ds is None and _columnar_format(table_path) is not None:
+            write_lists_to_csv(arg['DataPath'], [[f"(pyarrow not installed: {os.path.basename(table_path)})"]])
+            return False
+        return True
+
+    def run_rpc_request(self, arg):
+        """
+        Run one request received over the local RPC endpoint, on the calling thread.
+        The output is written to DataPath as usual (GetDataset and /dataset read it there)
+        and its content is returned to the caller.
+        """
+        arg = convert_dict(arg)
+        arg.setdefault('BinaryOutput', True)  # RPC callers are the web app, which reads the .tri
+        if self.check_request(arg):
+            self.run_request(arg)
+        with open(arg['DataPath'], mode='rb') as f:
+            return f.read()
+
+    def run_job(self, job):
+        if isinstance(job, list):
+            self.run_group(job)
+        else:
+            self.run_request(job)
+
+    def refresh_vps(self, project_name):
         # Check VPS Updates (guarded)
         with VPS_DICT_LOCK:
             if project_name + " - Version" in VPS_DICT:
-                vps_last_modified_time = _get_vps_last_modified_time(project_name)
-                if VPS_DICT[project_name + " - Version"] < vps_last_modified_time:
+                if VPS_DICT[project_name + " - Version"] != _get_vps_version(project_name):
                     load_to_VPS_DICT(project_name)
                     print(f">>> Virtual Project Settings Updated -> [{project_name} JSON]\n")
             # If missing, _get_df() will load it later; or you can proactively load it here.
 
+    def run_group(self, args):
+        """
+        Run a group of triangle requests (ADASTri/ADASVec/ADASTriDiag/Cell/Origin) coalesced by RequestCoalescer.
+        """
+        if debug_mode == 1:
+            print(args)
+
+        users = sorted({str(arg['UserName']) for arg in args})
+        print(f"\n> {get_current_time()} \n> {len(args)} grouped requests # {robot_id} # user [{', '.join(users)}] # queue [{self.queue_depth()}]")
+
+        self.refresh_vps(args[0]['ProjectName'])
+
+        try:
+            UDF_ADASTri_group(args)
+        except Exception as e:
+            if debug_mode:
+                import traceback
+                traceback.print_exc()
+                print(args)
+            else:
+                err_msg = f"(error: {str(e).upper()})"
+                print(err_msg)
+            for arg in args:
+                write_lists_to_csv(arg['DataPath'], [[0]])
+            return
+
+        print(f"> requests completed @ {get_current_time().split(' ')[1]}")
+
+    def run_request(self, arg):
+        project_name = arg['ProjectName']
+
+        if debug_mode == 1:
+            print(arg)
+
+        print(f"\n> {get_current_time()} \n> new request # {robot_id} # user [{arg['UserName']}] # queue [{self.queue_depth()}]")
+
+        self.refresh_vps(project_name)
+
         # Go to Functions
         try:
-            if arg['Function'] in ['ADASTri', 'ADASVec']:
+            if arg['Function'] in ['ADASTri', 'ADASVec', *TRIANGLE_SLICES]:
                 UDF_ADASTri(arg)
             elif arg['Function'] == 'ADASProjectSettings':
                 UDF_ADASProjectSettings(arg)
@@ -1198,11 +3170,95 @@ class RequestHandler(FileSystemEventHandler):
         print(f"> request completed @ {get_current_time().split(' ')[1]}")
 
 
+def _rpc_data_path_allowed(data_path):
+    """
+    Whether an RPC request may have its output written to data_path: a .csv in the ADAS data
+    folder, in a project's data folder (where SetDataPath puts it) or in apps.agent.rpc_data_dirs.
+    """
+    path = os.path.normcase(os.path.realpath(str(data_path)))
+    if not path.endswith('.csv'):
+        return False
+
+    roots = [PROJECT_ROOT / "data", *get_config_value('apps.agent.rpc_data_dirs', [])]
+    for root in roots:
+        if path.startswith(os.path.normcase(os.path.realpath(root)) + os.sep):
+            return True
+
+    projects_root = os.path.normcase(os.path.realpath(PROJECT_ROOT / "projects"))
+    if not path.startswith(projects_root + os.sep):
+        return False
+    parts = os.path.relpath(path, projects_root).split(os.sep)
+    return len(parts) >= 3 and parts[1] == 'data'
+
+
+class RPCRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /request with the request's argument dict as JSON (the same keys and values as a
+    request .txt file); the response body is the request's output file.
+    Callers must send Content-Type: application/json and the agent's 'RPC Token' (published
+    next to 'RPC Port' in its instance file) as X-ADAS-Token, so a web page cannot post to
+    it; DataPath must be in a data folder (see _rpc_data_path_allowed).
+    """
+    def do_POST(self):
+        if self.path != '/request':
+            self.send_error(404)
+            return
+        if self.headers.get_content_type() != 'application/json':
+            self.send_error(415, 'application/json required')
+            return
+        if not hmac.compare_digest(self.headers.get('X-ADAS-Token', ''), self.server.token):
+            self.send_error(403)
+            return
+
+        try:
+            arg = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        except Exception:
+            arg = None
+        if not isinstance(arg, dict) or 'DataPath' not in arg:
+            self.send_error(400, 'invalid request')
+            return
+        if not _rpc_data_path_allowed(arg['DataPath']):
+            self.send_error(403, 'DataPath outside the data folders')
+            return
+
+        try:
+            body = self.server.request_handler.run_rpc_request(arg)
+        except Exception as e:
+            print(e)
+            self.send_error(500, str(e))
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_rpc_server(request_handler):
+    """
+    Serve RPCRequestHandler on 127.0.0.1 (apps.agent.rpc_port, 0 = any free port).
+    Returns the port and a token for this agent instance, which are published in the
+    agent's instance file as 'RPC Port' and 'RPC Token'.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', get_config_value('apps.agent.rpc_port', 0)), RPCRequestHandler)
+    server.daemon_threads = True
+    server.request_handler = request_handler
+    server.token = secrets.token_urlsafe(32)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1], server.token
+
+
 def start_monitoring(path):
-    event_handler = RequestHandler()
+    event_handler = RequestHandler(get_config_value('apps.agent.worker_threads', 4),
+                                   get_config_value('apps.agent.coalesce_ms', 0))
     observer = Observer()
     observer.schedule(event_handler, path, recursive=False)
     observer.start()
+    CHANGE_TRACKER.start()
     print('Server ID: ' + robot_id + '\n')
 
     remove_old_instances()
@@ -1210,7 +3266,16 @@ def start_monitoring(path):
 
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    write_txt(id_path, {'Server': robot_id, 'Last seen': current_time})
+    instance_info = {'Server': robot_id, 'Last seen': current_time}
+    if get_config_value('apps.agent.rpc', True):
+        try:
+            port, token = start_rpc_server(event_handler)
+            instance_info['RPC Port'], instance_info['RPC Token'] = str(port), token
+            print(f"RPC endpoint: http://127.0.0.1:{instance_info['RPC Port']}/request\n")
+        except OSError as e:
+            print(f"Error starting RPC endpoint: {e}")
+
+    write_txt(id_path, instance_info)
 
     try:
         while True:
@@ -1227,10 +3292,15 @@ def start_monitoring(path):
             # Update Status
             arg_1 = read_txt(id_path)
             arg_1['Last seen'] = current_time
+            arg_1['Result Cache'] = result_cache_status()
+            arg_1['Queue Depth'] = str(event_handler.queue_depth())
             write_txt(id_path, arg_1)
 
+            # Stat fallback for changes watchdog did not report (e.g. on network shares)
+            CHANGE_TRACKER.poll()
+
             # Check Base Settings (New Version Available?)
-            if BASE_DICT["Project Map - Version"] < File(project_map_path).last_modified_time:
+            if BASE_DICT["Project Map - Version"] != CHANGE_TRACKER.version(project_map_path):
                 load_BASE_DICT()
                 print(">>> Project Map Updated\n")
 
@@ -1238,8 +3308,10 @@ def start_monitoring(path):
 
     except KeyboardInterrupt:
         observer.stop()
-        
+
+    CHANGE_TRACKER.stop()
     observer.join()
 
 
-start_monitoring(f"{PROJECT_ROOT}\\requests")
+if __name__ == "__main__":
+    start_monitoring(f"{PROJECT_ROOT}\\requests")
@@ -136,6 +136,12 @@ class File:
             os.chmod(self.path, file_attributes | stat.S_IWRITE)
 
 
+# Optional source of config.json versions (e.g. an agent's file change tracker).
+# When set, get_config_value reuses the parsed config until the version changes.
+_config_version_fn = None
+_config_cache = None  # (version, data), replaced as a whole
+
+
 def load_config() -> dict:
     if not CONFIG_PATH.exists():
         return {}
@@ -144,6 +150,27 @@ def load_config() -> dict:
         return json.load(f)
 
 
+def track_config_version(version_fn) -> None:
+    """
+    version_fn() returns a value that changes whenever config.json changes.
+    """
+    global _config_version_fn, _config_cache
+    _config_version_fn = version_fn
+    _config_cache = None
+
+
+def _cached_config() -> dict:
+    global _config_cache
+    if _config_version_fn is None:
+        return load_config()
+
+    version = _config_version_fn()  # taken before the read, so a change during it is not missed
+    cache = _config_cache
+    if cache is None or cache[0] != version:
+        cache = _config_cache = (version, load_config())
+    return cache[1]
+
+
 def save_config(data: dict) -> None:
     CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
 
@@ -163,7 +190,7 @@ def get_config_value(
       'shared.data_dir'
       'apps.agent.max_workers'
     """
-    data = load_config()
+    data = _cached_config()
 
     cur = data
     for key in key_path.split("."):
@@ -0,0 +1,151 @@
+import os
+import sys
+import json
+import shutil
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+
+def _import_agent(adas_root):
+    # The agent imports core.utils from the ADAS root it is deployed under
+    (adas_root / "core").mkdir(parents=True)
+    shutil.copy(SRC / "utils.py", adas_root / "core" / "utils.py")
+    os.environ["ADAS_CONFIG"] = str(adas_root / "core" / "config.json")
+    sys.path.insert(0, str(adas_root))
+
+    try:
+        os.getlogin()
+    except OSError:  # no controlling terminal (CI)
+        os.getlogin = lambda: "pytest"
+
+    spec = importlib.util.spec_from_file_location("agent_main", SRC / "agent" / "main.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["agent_main"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def agent(tmp_path_factory):
+    return _import_agent(tmp_path_factory.mktemp("root") / "ADAS")
+
+
+@pytest.fixture
+def config(agent):
+    """
+    Set apps.agent.* values for one test: config(table_cache=False, ...).
+    """
+    config_path = Path(os.environ["ADAS_CONFIG"])
+
+    def set_values(**values):
+        data = json.loads(config_path.read_text()) if config_path.exists() else {}
+        data.setdefault("apps", {}).setdefault("agent", {}).update(values)
+        # Replaced, not rewritten: an image thread of an earlier test may be reading it
+        tmp_path = config_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(data))
+        os.replace(tmp_path, config_path)
+        sys.modules["core.utils"]._config_cache = None
+
+    yield set_values
+    config_path.unlink(missing_ok=True)
+    sys.modules["core.utils"]._config_cache = None
+
+
+@pytest.fixture
+def project(agent):
+    """
+    Register a project on a source table: project(name, table_path, settings=True, classes=("A", "B"),
+    datasets=()). Source Table: AccYM / DevYM dates, LOB reserving class (All = sum of classes; a class
+    given as (name, source) matches the LOB values in source);
+    datasets Paid (PaidLoss) and Inc (IncLoss), plus any (name, source, data format) rows in datasets.
+    settings=False leaves out general_settings.json.
+    """
+    created = []
+
+    def make(name, table_path, settings=True, classes=("A", "B"), datasets=()):
+        project_dir = Path(agent.PROJECT_ROOT) / "projects" / name
+        project_dir.mkdir(parents=True, exist_ok=True)
+        json.dump({"rows": [
+            {"field_name": "AccYM", "significance": "Origin Date"},
+            {"field_name": "DevYM", "significance": "Development Date"},
+            {"field_name": "LOB", "significance": "Reserving Class", "level": 1},
+        ]}, open(project_dir / "field_mapping.json", "w"))
+        json.dump({"columns": ["Name", "Source", "Data Format"], "rows": [
+            ["Paid", "PaidLoss", "Triangle"], ["Inc", "IncLoss", "Triangle"], *map(list, datasets),
+        ]}, open(project_dir / "dataset_types.json", "w"))
+        json.dump({"columns": ["Name", "Level", "Source", "Formula", "EEX Formula"], "rows": [
+            ["All", "1", "", " + ".join(c if isinstance(c, str) else c[0] for c in classes), ""],
+            *[[c, "1", "", "", ""] if isinstance(c, str) else [c[0], "1", c[1], "", ""] for c in classes],
+        ]}, open(project_dir / "reserving_class_types.json", "w"))
+        if settings:
+            json.dump({"origin_start_date": "201901", "origin_end_date": "202012",
+                       "development_end_date": "202012"}, open(project_dir / "general_settings.json", "w"))
+        agent.BASE_DICT.setdefault("Table Paths", {})[name] = str(table_path)
+        created.append(name)
+        return name
+
+    yield make
+    for name in created:
+        agent.BASE_DICT["Table Paths"].pop(name, None)
+        agent.VPS_DICT.pop(name, None)
+        agent.VPS_DICT.pop(name + " - Version", None)
+        agent.PROJECT_SETTINGS_CACHE.pop(name, None)
+        shutil.rmtree(Path(agent.PROJECT_ROOT) / "projects" / name)
+
+
+@pytest.fixture
+def loss_table(tmp_path):
+    """
+    Write a random source table for the project fixture and return its path:
+    loss_table(n=2000, seed=0, name="table.csv"). Origins 2019-2020, evaluated at 202012.
+    """
+    def make(n=2000, seed=0, name="table.csv"):
+        rng = np.random.default_rng(seed)
+        acc = rng.integers(0, 24, n)
+        dev = acc + (rng.integers(0, 24, n) % (24 - acc))
+
+        def ym(k):
+            return 201901 + k // 12 * 100 + k % 12
+
+        df = pd.DataFrame({
+            "AccYM": ym(acc), "DevYM": ym(dev), "LOB": rng.choice(["A", "B", "C"], n),
+            "PaidLoss": rng.random(n).round(2) * 100, "IncLoss": rng.random(n).round(2) * 200 + 1,
+        })
+        path = tmp_path / name
+        df.to_csv(path, index=False)
+        return path
+
+    return make
+
+
+@pytest.fixture
+def triangle(agent, tmp_path):
+    """
+    Compute a triangle request without publishing it: triangle(name, **fields) -> DataFrame.
+    Defaults: ADASTri of Paid at All, cumulative, 12 / 12 month origin / development lengths.
+    """
+    def compute(name, **fields):
+        arg = {
+            "Function": "ADASTri", "ProjectName": name, "Path": "All", "DatasetName": "Paid",
+            "Cumulative": "True", "OriginLength": "12", "DevelopmentLength": "12",
+            "DataPath": str(tmp_path / "result.csv"), "UserName": "pytest",
+        }
+        arg.update(fields)
+        return agent._compute_ADASTri(agent.convert_dict(arg))
+
+    return compute
+
+
+@pytest.fixture(autouse=True)
+def clean_tables(agent):
+    yield
+    for key in [k for k in agent.DATA_DICT if not k.endswith(" - Version")]:
+        agent._remove_table(key)
+    agent.RESULT_CACHE.clear()
+    agent.CHANGE_TRACKER.versions.clear()
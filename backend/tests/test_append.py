@@ -0,0 +1,81 @@
+import os
+import time
+
+HEADER = "AccYM,DevYM,LOB,PaidLoss,IncLoss\n"
+ROWS = [f"2019{m:02d},2020{m:02d},{'AB'[m % 2]},{m}.0,{m * 2}.0\n" for m in range(1, 13)]
+
+
+def _refresh(agent, path, text):
+    path.write_text(text)
+    agent.CHANGE_TRACKER.refresh(str(path))
+
+
+def test_appended_rows_are_merged(agent, config, project, tmp_path, monkeypatch):
+    config(table_cache=False)
+    path = tmp_path / "table.csv"
+    path.write_text(HEADER + "".join(ROWS))
+    name = project("Append", path)
+    assert len(agent._get_df(name)) == 12
+
+    _refresh(agent, path, HEADER + "".join(ROWS) + "202101,202101,A,100.0,200.0\n")
+    monkeypatch.setattr(agent, "load_to_DATA_DICT", None)  # a reload would fail
+    df = agent._get_df(name)
+    assert len(df) == 13 and df["PaidLoss"].iloc[-1] == 100.0
+
+
+def test_restated_rows_reload_the_table(agent, config, project, tmp_path, monkeypatch):
+    config(table_cache=False)
+    monkeypatch.setattr(agent, "APPEND_CHECK_BYTES", 16)  # the prefix checksum reads many blocks
+    path = tmp_path / "table.csv"
+    path.write_text(HEADER + "".join(ROWS))
+    name = project("Restate", path)
+    agent._get_df(name)
+
+    # A middle row restated to a value of the same width, and a new row appended
+    rows = list(ROWS)
+    rows[6] = rows[6].replace(",7.0,", ",9.0,")
+    _refresh(agent, path, HEADER + "".join(rows) + "202101,202101,A,100.0,200.0\n")
+
+    loads = []
+    load_to_DATA_DICT = agent.load_to_DATA_DICT
+    monkeypatch.setattr(agent, "load_to_DATA_DICT", lambda *a, **k: loads.append(a) or load_to_DATA_DICT(*a, **k))
+    df = agent._get_df(name)
+    assert len(loads) == 1
+    assert len(df) == 13 and df["PaidLoss"].iloc[6] == 9.0
+
+
+def test_table_image_keeps_the_append_checksum(agent, config, project, tmp_path, monkeypatch):
+    config(table_cache=True, mmap_tables=False, table_cache_dir=str(tmp_path / "images"))
+    path = tmp_path / "table.csv"
+    path.write_text(HEADER + "".join(ROWS))
+    name = project("Imaged", path)
+    agent._get_df(name)
+    key = agent._table_key(str(path))
+    checksum = agent.TABLE_APPEND_STATE[key]["checksum"]
+
+    image_json = os.path.join(agent._table_image_dir(str(path), path.stat()), "table.json")
+    for _ in range(100):  # the image is written off-thread
+        if os.path.exists(image_json):
+            break
+        time.sleep(0.05)
+    agent._remove_table(key)
+
+    # A load from the image takes the checksum stored with it instead of reading the source again
+    monkeypatch.setattr(agent, "_ChecksumReader", None)
+    agent._get_df(name)
+    assert agent.TABLE_APPEND_STATE[key]["checksum"] == checksum
+
+    _refresh(agent, path, HEADER + "".join(ROWS) + "202101,202101,A,100.0,200.0\n")
+    monkeypatch.setattr(agent, "load_to_DATA_DICT", None)
+    assert len(agent._get_df(name)) == 13
+
+
+def test_no_checksum_without_incremental_refresh(agent, config, project, tmp_path, monkeypatch):
+    config(table_cache=False, incremental_refresh=False)
+    path = tmp_path / "table.csv"
+    path.write_text(HEADER + "".join(ROWS))
+    name = project("NoAppend", path)
+
+    monkeypatch.setattr(agent, "_ChecksumReader", None)
+    assert len(agent._get_df(name)) == 12
+    assert agent.TABLE_APPEND_STATE[agent._table_key(str(path))] is None
@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+PATHS = ("All", "A", "AB")  # AB = A less B: excluded rows flip sign
+
+
+@pytest.mark.parametrize("function", ["ADASTri", "ADASVec"])
+@pytest.mark.parametrize("cumulative", [True, False])
+@pytest.mark.parametrize("org_len, dev_len", [(12, 12), (12, 3), (3, 1), (6, 6), (12, 1), (12, "Default")])
+def test_vectorized_bucketing_matches_legacy(agent, config, project, loss_table, triangle,
+                                             function, cumulative, org_len, dev_len):
+    name = project("Bucketing", loss_table(), classes=("A", "B", ("AB", "A - B")))
+
+    results = {}
+    for legacy in (True, False):
+        config(table_cache=False, legacy_bucketing=legacy)
+        results[legacy] = {path: triangle(name, Function=function, Path=path, Cumulative=str(cumulative),
+                                          OriginLength=str(org_len), DevelopmentLength=str(dev_len))
+                           for path in PATHS}
+
+    for path in PATHS:
+        pd.testing.assert_frame_equal(results[False][path], results[True][path])
+        assert np.nansum(np.abs(results[False][path].to_numpy())) > 0
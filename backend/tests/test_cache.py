@@ -0,0 +1,55 @@
+import pandas as pd
+
+
+def _request(agent, name, tmp_path, **fields):
+    arg = {"Function": "ADASTri", "ProjectName": name, "Path": "A", "DatasetName": "Paid", "Cumulative": "True",
+           "OriginLength": "12", "DevelopmentLength": "12", "DataPath": str(tmp_path / "result.csv"),
+           "UserName": "pytest"}
+    arg.update(fields)
+    return agent.convert_dict(arg)
+
+
+def test_result_cache_serves_repeats_until_the_table_changes(agent, config, project, loss_table, tmp_path,
+                                                             monkeypatch):
+    config(table_cache=False)
+    path = loss_table()
+    name = project("Cached", path)
+    computed = []
+    compute = agent._compute_ADASTri
+    monkeypatch.setattr(agent, "_compute_ADASTri", lambda arg: computed.append(arg) or compute(arg))
+
+    agent.UDF_ADASTri(_request(agent, name, tmp_path))
+    first = pd.read_csv(tmp_path / "result.csv", header=None)
+    agent.UDF_ADASTri(_request(agent, name, tmp_path))
+    assert len(computed) == 1
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "result.csv", header=None), first)
+
+    # Another dataset is another entry
+    agent.UDF_ADASTri(_request(agent, name, tmp_path, DatasetName="Inc"))
+    assert len(computed) == 2
+
+    with open(path, "a") as f:
+        f.write("201901,201912,A,1000000.0,1.0\n")
+    agent.CHANGE_TRACKER.refresh(str(path))
+    agent.UDF_ADASTri(_request(agent, name, tmp_path))
+    assert len(computed) == 3
+    assert pd.read_csv(tmp_path / "result.csv", header=None).iloc[0, 0] == first.iloc[0, 0] + 1000000.0
+
+
+def test_result_cache_keeps_the_most_recently_used(agent, config, project, loss_table, tmp_path, monkeypatch):
+    config(table_cache=False, result_cache_size=2)
+    name = project("Bounded", loss_table())
+    computed = []
+    compute = agent._compute_ADASHeaders
+    monkeypatch.setattr(agent, "_compute_ADASHeaders", lambda arg: computed.append(arg) or compute(arg))
+
+    def headers(period_type):
+        agent.UDF_ADASHeaders(_request(agent, name, tmp_path, Function="ADASHeaders", periodType=str(period_type),
+                                       PeriodLength="12", Transposed="False", StoredPeriodLength="-1"))
+
+    for period_type in (0, 1, 0, 2):  # 0 is used again, so 1 is evicted for 2
+        headers(period_type)
+    headers(0)
+    assert len(computed) == 3
+    headers(1)
+    assert len(computed) == 4
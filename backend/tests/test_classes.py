@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.mark.parametrize("values", [["A"], ["A", "Z"], [], ["C", "B"]])
+def test_code_lookup_matches_isin(agent, values):
+    series = pd.Series(["A", "B", None, "C", "A", "B"], dtype=object)
+    expected = series.isin(values).to_numpy()
+    np.testing.assert_array_equal(agent._isin_mask(series.astype("category"), values), expected)
+    np.testing.assert_array_equal(agent._isin_mask(series, values), expected)
+
+
+def test_class_columns_are_integer_coded(agent, config, project, loss_table, triangle, monkeypatch):
+    config(table_cache=False)
+    path = loss_table()
+    name = project("Coded", path, classes=("A", "B", ("AB", "A - B")))
+    assert isinstance(agent._get_df(name)["LOB"].dtype, pd.CategoricalDtype)
+    coded = {p: triangle(name, Path=p) for p in ("All", "A", "AB")}
+
+    # The same requests on a plain text column
+    agent._remove_table(agent._table_key(str(path)))
+    monkeypatch.setattr(agent, "_encode_categorical_columns", lambda df, cols: None)
+    assert agent._get_df(name)["LOB"].dtype == object
+    for p, result in coded.items():
+        pd.testing.assert_frame_equal(triangle(name, Path=p), result)
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+
+def _table(n=240):
+    k = np.arange(n)
+    return pd.DataFrame({
+        "AccYM": 201901 + (k % 24) // 12 * 100 + k % 12,
+        "DevYM": 202001 + (k % 12),
+        "LOB": np.where(k % 3 == 0, "A", "B"),
+        "PaidLoss": k * 1.0,
+        "IncLoss": k * 2.0,
+    })
+
+
+def _settings(agent, config, path, name, scan):
+    config(table_cache=False, scan_table_bytes=0 if scan else 1024**3)
+    agent.PROJECT_SETTINGS_CACHE.pop(name, None)
+    df = agent._get_df(name)
+    assert (agent._table_key(str(path)) in agent.TABLE_SCANS) == scan
+    return agent._load_project_settings(name, df, list(agent._vps_index(name).date_cols))
+
+
+def test_scanned_table_dates_come_from_the_dataset(agent, config, project, tmp_path):
+    df = _table()
+    df["AccYM"] = df["AccYM"].astype(float)
+    df.loc[0, "AccYM"] = np.nan  # the sample row has no origin date
+    path = tmp_path / "table.parquet"
+    df.to_parquet(path, row_group_size=50)
+    name = project("NoSettings", path, settings=False)
+
+    resident = _settings(agent, config, path, name, scan=False)
+    agent._remove_table(agent._table_key(str(path)))
+    scanned = _settings(agent, config, path, name, scan=True)
+
+    assert scanned == resident
+    assert (scanned["origin_start"], scanned["origin_end"], scanned["dev_end"]) == (201901, 202012, 202012)
+    assert scanned["date_granularity"] == "monthly"
+
+
+def test_partitioned_folder_tracks_files_inside_partitions(agent, config, project, tmp_path):
+    from watchdog.events import FileCreatedEvent, FileModifiedEvent
+
+    config(table_cache=False)
+    folder = tmp_path / "table"
+    (folder / "year=2019").mkdir(parents=True)
+    part = folder / "year=2019" / "part-0.parquet"
+    _table(120).to_parquet(part)
+    name = project("Partitioned", folder)
+    tracker = agent.CHANGE_TRACKER
+    assert len(agent._get_df(name)) == 120
+
+    # A new file inside an existing partition leaves the folder's own mtime and size alone
+    new_part = folder / "year=2019" / "part-1.parquet"
+    _table(60).to_parquet(new_part)
+    tracker.on_any_event(FileCreatedEvent(str(new_part)))
+    assert len(agent._get_df(name)) == 180
+
+    # So does rewriting one in place
+    version = tracker.version(str(folder))
+    _table(30).to_parquet(part)
+    tracker.on_any_event(FileModifiedEvent(str(part)))
+    assert tracker.version(str(folder)) != version
+    assert len(agent._get_df(name)) == 90
+
+
+def _triangle(agent, name, path, tmp_path):
+    arg = agent.convert_dict({
+        "Function": "ADASTri", "ProjectName": name, "Path": path, "DatasetName": "Paid",
+        "Cumulative": "True", "OriginLength": "12", "DevelopmentLength": "12",
+        "DataPath": str(tmp_path / "result.csv"), "UserName": "pytest",
+    })
+    return agent._compute_ADASTri(arg)
+
+
+def test_numeric_class_column_filters_alike_resident_and_scanned(agent, config, project, tmp_path):
+    df = _table()
+    df["LOB"] = np.where(df["LOB"] == "A", 10, 20)
+    path = tmp_path / "table.parquet"
+    df.to_parquet(path, row_group_size=50)
+    name = project("NumericClass", path, classes=(("Ten", "10"), ("Twenty", "20")))
+
+    results = {}
+    for scan in (False, True):
+        config(table_cache=False, scan_table_bytes=0 if scan else 1024**3)
+        agent._remove_table(agent._table_key(str(path)))
+        agent._get_df(name)
+        assert (agent._table_key(str(path)) in agent.TABLE_SCANS) == scan
+        results[scan] = {p: _triangle(agent, name, p, tmp_path) for p in ("Ten", "Twenty", "All")}
+
+    for p in ("Ten", "Twenty", "All"):
+        pd.testing.assert_frame_equal(results[False][p], results[True][p])
+    paid = {p: np.nansum(results[True][p].select_dtypes("number").to_numpy()) for p in ("Ten", "Twenty", "All")}
+    assert paid["Ten"] > 0 and paid["Twenty"] > 0
+
+
+def test_scanned_requests_reuse_the_dataset(agent, config, project, tmp_path, monkeypatch):
+    from watchdog.events import FileCreatedEvent
+
+    config(table_cache=False, scan_table_bytes=0)
+    folder = tmp_path / "table"
+    _table().to_parquet(folder, partition_cols=["LOB"])
+    name = project("ScannedParts", folder)
+    _triangle(agent, name, "All", tmp_path)
+
+    datasets = []
+    dataset = agent.pa_ds.dataset
+    monkeypatch.setattr(agent.pa_ds, "dataset", lambda *a, **k: datasets.append(a) or dataset(*a, **k))
+    for _ in range(3):
+        _triangle(agent, name, "A", tmp_path)
+    assert datasets == []
+
+    # A new partition file is a new version of the table: its dataset is built again
+    new_part = folder / "LOB=A" / "part-new.parquet"
+    _table(12).drop(columns="LOB").to_parquet(new_part)
+    agent.CHANGE_TRACKER.on_any_event(FileCreatedEvent(str(new_part)))
+    _triangle(agent, name, "A", tmp_path)
+    assert len(datasets) == 1
@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.mark.parametrize("formula", ["A // B", "A % B", "D = (A + B) // 3 % 2", "-A // B * 1000"])
+def test_formula_matches_pandas_eval(agent, formula):
+    rng = np.random.default_rng(0)
+    a = pd.DataFrame(rng.random((4, 4)) * 100)
+    b = pd.DataFrame(rng.integers(0, 5, (4, 4)).astype(float))  # includes zeros
+
+    expected = eval(formula.split("=", 1)[-1], {"__builtins__": {}}, {"A": a, "B": b})
+    expected = expected.replace([np.inf, -np.inf], np.nan).fillna(0).to_numpy()
+    result = agent.eval_triangle_formula({"A": a, "B": b}, formula, a.shape)
+    np.testing.assert_allclose(result, expected)
+
+
+def test_formula_rejects_calls(agent):
+    with pytest.raises(ValueError):
+        agent.eval_triangle_formula({"A": np.ones((2, 2))}, "A.sum()", (2, 2))
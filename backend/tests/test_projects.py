@@ -0,0 +1,26 @@
+import json
+
+import numpy as np
+from pathlib import Path
+
+HEADER = "AccYM,DevYM,LOB,PaidLoss,IncLoss\n"
+ROWS = [f"2019{m:02d},2020{m:02d},{'AB'[m % 2]},{m}.0,{m * 2}.0\n" for m in range(1, 13)]
+
+
+def test_dataset_types_without_data_format(agent, config, project, tmp_path):
+    config(table_cache=False)
+    path = tmp_path / "table.csv"
+    path.write_text(HEADER + "".join(ROWS))
+    name = project("NoDataFormat", path)
+    json.dump({"columns": ["Name", "Source"], "rows": [["Paid", "PaidLoss"]]},
+              open(Path(agent.PROJECT_ROOT) / "projects" / name / "dataset_types.json", "w"))
+
+    agent.load_to_VPS_DICT(name)
+    assert agent._vps_index(name).datasets["Paid"] == ("PaidLoss", "", ["PaidLoss"])
+
+    arg = agent.convert_dict({
+        "Function": "ADASTri", "ProjectName": name, "Path": "All", "DatasetName": "Paid",
+        "Cumulative": "True", "OriginLength": "12", "DevelopmentLength": "12",
+        "DataPath": str(tmp_path / "result.csv"), "UserName": "pytest",
+    })
+    assert np.nansum(agent._compute_ADASTri(arg).to_numpy()) == 78.0
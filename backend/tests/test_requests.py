@@ -0,0 +1,260 @@
+import os
+import threading
+import time
+
+
+def test_claim_tells_a_held_file_from_a_lost_race(agent, tmp_path, monkeypatch):
+    path = tmp_path / "request.txt"
+    path.write_text("Function = ADASTri\n")
+
+    def held(src, dst):
+        raise PermissionError(src)
+
+    monkeypatch.setattr(agent.os, "rename", held)
+    assert agent.claim_request(str(path), attempts=3, delay=0) == agent.CLAIM_BUSY
+    assert path.exists()
+
+    monkeypatch.undo()
+    assert agent.claim_request(str(tmp_path / "gone.txt")) is None
+
+
+def test_held_request_is_claimed_once_released(agent, project, tmp_path, monkeypatch):
+    name = project("Claim", tmp_path / "table.csv")
+    path = tmp_path / "request.txt"
+    path.write_text(f"Function = ADASTri\nProjectName = {name}\nDataPath = {tmp_path / 'out.csv'}\n")
+
+    # The sender holds the file for longer than one claim keeps retrying
+    rename, attempts = os.rename, []
+
+    def held_at_first(src, dst):
+        attempts.append(src)
+        if len(attempts) <= 120:
+            raise PermissionError(src)
+        rename(src, dst)
+
+    monkeypatch.setattr(agent.os, "rename", held_at_first)
+    monkeypatch.setattr(agent, "CLAIM_RETRY_SECONDS", 0.01)
+    handler = agent.RequestHandler()
+    ran = []
+    monkeypatch.setattr(handler, "run_job", ran.append)
+
+    handler.accept_request(str(path))
+    deadline = time.time() + 10
+    while not ran and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert [job["ProjectName"] for job in ran] == [name]
+    assert not path.exists()
+
+
+def test_batch_file_shares_its_header_lines(agent, tmp_path):
+    path = tmp_path / "batch.txt"
+    path.write_text("UserName = pytest\nProjectName = P\n"
+                    "---\nFunction = ADASTri\nDataPath = a.csv\n"
+                    "---\nFunction = ADASHeaders\nProjectName = Q\nDataPath = b.csv\n"
+                    "---\n")
+    assert agent.read_request_txt(str(path)) == [
+        {"UserName": "pytest", "ProjectName": "P", "Function": "ADASTri", "DataPath": "a.csv"},
+        {"UserName": "pytest", "ProjectName": "Q", "Function": "ADASHeaders", "DataPath": "b.csv"},
+    ]
+
+    path.write_text("Function = ADASTri\nProjectName = P\n")
+    assert agent.read_request_txt(str(path)) == [{"Function": "ADASTri", "ProjectName": "P"}]
+
+
+def test_batch_calls_are_dispatched_in_groups(agent, project, tmp_path, monkeypatch):
+    name = project("Batch", tmp_path / "table.csv")
+    path = tmp_path / "batch.txt"
+    path.write_text(f"UserName = pytest\nProjectName = {name}\nPath = All\nOriginLength = 12\nDevelopmentLength = 12\n"
+                    f"---\nFunction = ADASTri\nDatasetName = Paid\nDataPath = {tmp_path / 'paid.csv'}\n"
+                    f"---\nFunction = ADASTri\nDatasetName = Inc\nDataPath = {tmp_path / 'inc.csv'}\n"
+                    f"---\nFunction = ADASHeaders\nDataPath = {tmp_path / 'headers.csv'}\n")
+    handler = agent.RequestHandler()
+    ran = []
+    monkeypatch.setattr(handler, "run_job", ran.append)
+
+    handler.accept_request(str(path))
+    assert [[arg["DataPath"] for arg in agent._job_args(job)] for job in ran] == [
+        [str(tmp_path / "paid.csv"), str(tmp_path / "inc.csv")], [str(tmp_path / "headers.csv")],
+    ]
+    assert ran[1]["UserName"] == "pytest" and ran[1]["ProjectName"] == name
+    assert not path.exists()
+
+
+def test_rpc_endpoint_only_serves_its_own_clients(agent):
+    import json
+    import urllib.error
+    import urllib.request
+
+    class Handler:
+        def run_rpc_request(self, arg):
+            return b"ok"
+
+    port, token = agent.start_rpc_server(Handler())
+    data_path = str(agent.PROJECT_ROOT / "projects" / "P1" / "data" / "result.csv")
+
+    def post(arg, content_type="application/json", token=token):
+        headers = {"Content-Type": content_type} if content_type else {}
+        if token is not None:
+            headers["X-ADAS-Token"] = token
+        req = urllib.request.Request(f"http://127.0.0.1:{port}/request", data=json.dumps(arg).encode(),
+                                     headers=headers, method="POST")
+        try:
+            with urllib.request.urlopen(req, timeout=5) as resp:
+                return resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            return e.code, None
+
+    assert post({"DataPath": data_path}) == (200, b"ok")
+    assert post({"DataPath": data_path}, content_type="text/plain")[0] == 415  # a "simple" cross-site POST
+    assert post({"DataPath": data_path}, token=None)[0] == 403
+    assert post({"DataPath": data_path}, token="guess")[0] == 403
+    assert post({"DataPath": str(agent.PROJECT_ROOT / "core" / "config.csv")})[0] == 403
+    assert post({"DataPath": str(agent.PROJECT_ROOT / "projects" / "P1" / "field_mapping.json")})[0] == 403
+    assert post({"DataPath": str(agent.PROJECT_ROOT / "data" / ".." / "core" / "x.csv")})[0] == 403
+    assert post({"DataPath": str(agent.PROJECT_ROOT / "data" / "result.csv")}) == (200, b"ok")
+
+
+def test_columnar_table_without_pyarrow_is_reported(agent, project, tmp_path, monkeypatch):
+    name = project("NoArrow", tmp_path / "table.parquet")
+    out = tmp_path / "out.csv"
+    monkeypatch.setattr(agent, "pa_ds", None)
+    assert not agent.RequestHandler().check_request({"ProjectName": name, "DataPath": str(out)})
+    assert "pyarrow not installed: table.parquet" in out.read_text()
+
+
+def test_binary_output_only_for_requests_that_read_it(agent, config, tmp_path):
+    import pandas as pd
+
+    config()
+    df = pd.DataFrame([[1.0, 2.0], [3.0, float("nan")]])
+    out, tri = tmp_path / "result.csv", tmp_path / "result.tri"
+    agent._export_dataframe(df, {"DataPath": str(out)})  # an Excel request
+    assert out.exists() and not tri.exists()
+
+    agent._export_dataframe(df, {"DataPath": str(out), "BinaryOutput": True})
+    assert tri.read_bytes().startswith(agent.TRIANGLE_BINARY_MAGIC)
+
+
+class _Jobs:
+    # Stand-in RequestHandler for RequestPool: records the jobs it runs and how many ran at once
+    def __init__(self, run=None):
+        self.run = run
+        self.lock = threading.Lock()
+        self.started, self.running, self.most = [], 0, 0
+
+    def run_job(self, job):
+        with self.lock:
+            self.started.append(job["Id"])
+            self.running += 1
+            self.most = max(self.most, self.running)
+        try:
+            if self.run is not None:
+                self.run(job)
+            else:
+                time.sleep(0.01)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def test_pool_runs_requests_concurrently(agent, config):
+    config()
+    barrier = threading.Barrier(4, timeout=5)  # only passes if all four run at once
+    jobs = _Jobs(lambda job: barrier.wait())
+    pool = agent.RequestPool(jobs, workers=4)
+    for i in range(4):
+        pool.submit({"Id": i, "ProjectName": "P"})
+    pool.executor.shutdown(wait=True)
+    assert not barrier.broken and sorted(jobs.started) == [0, 1, 2, 3]
+    assert pool.queue_depth() == 0
+
+
+def test_pool_runs_an_ordered_project_one_at_a_time(agent, config):
+    config(ordered_projects=["Ordered"])
+    jobs = _Jobs()
+    pool = agent.RequestPool(jobs, workers=4)
+    for i in range(8):
+        pool.submit({"Id": i, "ProjectName": "Ordered"})
+    pool.executor.shutdown(wait=True)
+    assert jobs.started == list(range(8)) and jobs.most == 1
+    assert pool.queue_depth() == 0
+
+
+def _arg(agent, tmp_path, out, **fields):
+    arg = {"Function": "ADASTri", "ProjectName": "P", "Path": "All", "DatasetName": "Paid", "Cumulative": "True",
+           "OriginLength": "12", "DevelopmentLength": "12", "DataPath": str(tmp_path / f"{out}.csv"),
+           "UserName": "pytest"}
+    arg.update(fields)
+    return agent.convert_dict(arg)
+
+
+def test_group_requests_by_project_path_and_lengths(agent, tmp_path):
+    args = [
+        _arg(agent, tmp_path, "paid"),
+        _arg(agent, tmp_path, "headers", Function="ADASHeaders"),
+        _arg(agent, tmp_path, "inc", DatasetName="Inc", Cumulative="False"),
+        _arg(agent, tmp_path, "other_path", Path="A"),
+        _arg(agent, tmp_path, "cell", Function="ADASTriCell", OriginPeriod="1", DevelopmentPeriod="1"),
+        _arg(agent, tmp_path, "quarterly", OriginLength="3"),
+    ]
+    jobs = agent.group_requests(args)
+    assert [[arg["DataPath"] for arg in agent._job_args(job)] for job in jobs] == [
+        [args[0]["DataPath"], args[2]["DataPath"], args[4]["DataPath"]],
+        [args[1]["DataPath"]], [args[3]["DataPath"]], [args[5]["DataPath"]],
+    ]
+
+
+def test_coalescer_hands_on_a_burst_as_groups(agent, tmp_path):
+    dispatched = []
+    coalescer = agent.RequestCoalescer(dispatched.append, 0.05)
+    for dataset in ("Paid", "Inc"):
+        coalescer.add(_arg(agent, tmp_path, dataset, DatasetName=dataset))
+    coalescer.add(_arg(agent, tmp_path, "headers", Function="ADASHeaders"))
+    deadline = time.time() + 5
+    while not dispatched and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert len(dispatched) == 2
+    assert [arg["DatasetName"] for arg in dispatched[0]] == ["Paid", "Inc"]
+    assert dispatched[1]["Function"] == "ADASHeaders"
+
+
+def test_grouped_requests_write_what_single_requests_write(agent, config, project, loss_table, tmp_path):
+    config(table_cache=False)
+    name = project("P", loss_table())
+    fields = [dict(DatasetName="Paid"), dict(DatasetName="Inc", Cumulative="False"),
+              dict(Function="ADASTriCell", OriginPeriod="2", DevelopmentPeriod="1")]
+
+    for i, f in enumerate(fields):
+        agent.UDF_ADASTri(_arg(agent, tmp_path, f"single{i}", ProjectName=name, **f))
+    agent.RESULT_CACHE.clear()
+    agent.UDF_ADASTri_group([_arg(agent, tmp_path, f"grouped{i}", ProjectName=name, **f)
+                             for i, f in enumerate(fields)]
+                            + [_arg(agent, tmp_path, "missing", ProjectName=name, DatasetName="Nope")])
+
+    for i in range(len(fields)):
+        assert (tmp_path / f"grouped{i}.csv").read_text() == (tmp_path / f"single{i}.csv").read_text()
+    # A request that fails on its own does not fail the group
+    assert (tmp_path / "missing.csv").read_text().strip() == "0"
+
+
+def test_binary_triangle_round_trips(agent, tmp_path):
+    import json
+    import struct
+
+    import numpy as np
+    import pandas as pd
+
+    df = pd.DataFrame([[1.5, 2.0, 3.25], [4.0, 5.0, np.nan]], index=["2019", "2020"], columns=[12, 24, 36])
+    path = tmp_path / "result.tri"
+    agent._write_triangle_binary(path, df)
+
+    # 8-byte magic, uint32 header length, JSON header, row-major little-endian float64 values
+    data = path.read_bytes()
+    magic, (header_len,) = data[:8], struct.unpack("<I", data[8:12])
+    header = json.loads(data[12:12 + header_len])
+    values = np.frombuffer(data[12 + header_len:], dtype="<f8").reshape(header["shape"])
+    assert magic == agent.TRIANGLE_BINARY_MAGIC
+    assert header == {"shape": [2, 3], "index": ["2019", "2020"], "columns": [12, 24, 36]}
+    np.testing.assert_array_equal(values, df.to_numpy())
@@ -0,0 +1,205 @@
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+HEADER = "AccYM,DevYM,LOB,PaidLoss,IncLoss\n"
+ROWS = [f"2019{m:02d},2020{m:02d},{'AB'[m % 2]},{m}.0,{m * 2}.0\n" for m in range(1, 13)]
+
+
+def _identity(agent, path):
+    return agent.DATA_DICT[agent._table_key(str(path)) + " - Version"][0]
+
+
+def _sha1(path):
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+
+def test_table_hash_follows_appends_without_rehashing(agent, config, project, tmp_path, monkeypatch):
+    config(table_cache=False, table_hash=True)
+    path = tmp_path / "table.csv"
+    path.write_text(HEADER + "".join(ROWS))
+    name = project("Hashed", path)
+
+    monkeypatch.setattr(agent, "_hash_source", None)  # the load and the append hash what they read
+    agent._get_df(name)
+    assert _identity(agent, path) == (path.stat().st_size, _sha1(path))
+
+    with open(path, "a") as f:
+        f.write("202101,202101,A,100.0,200.0\n")
+    agent.CHANGE_TRACKER.refresh(str(path))
+    assert len(agent._get_df(name)) == 13
+    assert _identity(agent, path) == (path.stat().st_size, _sha1(path))
+
+
+def test_table_hash_keeps_a_republished_table(agent, config, project, tmp_path):
+    config(table_cache=False, table_hash=True)
+    path = tmp_path / "table.csv"
+    path.write_text(HEADER + "".join(ROWS))
+    name = project("Republished", path)
+    df = agent._get_df(name)
+
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    agent.CHANGE_TRACKER.refresh(str(path))
+    assert agent._get_df(name) is df
+
+
+def test_repointed_link_loads_the_new_target(agent, config, project, tmp_path):
+    config(table_cache=False)
+    old, new = tmp_path / "2024Q1.csv", tmp_path / "2024Q2.csv"
+    old.write_text(HEADER + "".join(ROWS))
+    new.write_text(HEADER + "".join(ROWS) + "202101,202101,A,100.0,200.0\n")
+    link = tmp_path / "current.csv"
+    link.symlink_to(old)
+    name = project("Linked", link)
+    assert len(agent._get_df(name)) == 12
+
+    link.unlink()
+    link.symlink_to(new)
+    agent.CHANGE_TRACKER.refresh(str(link))
+    assert agent._table_key(str(link)) == agent._table_key(str(new))
+    assert len(agent._get_df(name)) == 13
+
+
+def test_load_reads_the_csv_header_once(agent, config, tmp_path, monkeypatch):
+    config(table_cache=True, table_cache_dir=str(tmp_path / "images"))
+    path = tmp_path / "table.csv"
+    path.write_text(HEADER + "".join(ROWS))
+
+    reads = []
+    read_csv_header = agent._read_csv_header
+    monkeypatch.setattr(agent, "_read_csv_header", lambda p: reads.append(p) or read_csv_header(p))
+    agent.load_to_DATA_DICT(str(path), ("LOB",), columns=("AccYM", "DevYM", "LOB", "PaidLoss"))
+    assert len(reads) == 1
+
+
+def test_mapped_table_only_counts_private_memory(agent, config, tmp_path):
+    config(table_cache=True, mmap_tables=True, table_cache_dir=str(tmp_path / "images"))
+    path = tmp_path / "table.csv"
+    path.write_text(HEADER + "".join(ROWS * 100))
+    key = agent._table_key(str(path))
+
+    # Parse privately, then publish the image and swap in its mapping as the loader's thread does
+    config(table_cache=False)
+    agent.load_to_DATA_DICT(str(path), ("LOB",))
+    config(table_cache=True)
+    df = agent.DATA_DICT[key]
+    private = agent.DATA_DICT_LRU[key]
+    agent._build_table_image(agent._table_image_dir(str(path), path.stat()), str(path), path.stat(), df, key, ("LOB",))
+
+    mapped = agent.DATA_DICT[key]
+    assert mapped is not df
+    assert agent.DATA_DICT_LRU[key] == agent._table_bytes(mapped) < private / 10
+
+
+def _wait_for(condition):
+    # Table images are written off-thread
+    for _ in range(100):
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_table_image_gains_columns_a_later_load_reads(agent, config, tmp_path, monkeypatch):
+    config(table_cache=True, table_cache_dir=str(tmp_path / "images"))
+    path = tmp_path / "table.csv"
+    path.write_text(HEADER + "".join(ROWS))
+    key = agent._table_key(str(path))
+    table_json = os.path.join(agent._table_image_dir(str(path), path.stat()), "table.json")
+
+    def image_columns():
+        return agent._read_json(table_json)["columns"] if os.path.exists(table_json) else []
+
+    agent.load_to_DATA_DICT(str(path), ("LOB",), columns=("AccYM", "DevYM", "LOB", "PaidLoss"))
+    assert _wait_for(lambda: image_columns() == ["AccYM", "DevYM", "LOB", "PaidLoss"])
+
+    # A second project reads IncLoss too: only that column is parsed, then kept in the image
+    agent._remove_table(key)
+    agent.load_to_DATA_DICT(str(path), ("LOB",), columns=("AccYM", "DevYM", "LOB", "IncLoss"))
+    assert _wait_for(lambda: "IncLoss" in image_columns())
+
+    agent._remove_table(key)
+    monkeypatch.setattr(agent, "_parse_csv", None)
+    agent.load_to_DATA_DICT(str(path), ("LOB",), columns=("AccYM", "DevYM", "LOB", "PaidLoss", "IncLoss"))
+    df = agent.DATA_DICT[key]
+    assert df["IncLoss"].tolist() == [m * 2.0 for m in range(1, 13)]
+    assert df["LOB"].tolist() == ["AB"[m % 2] for m in range(1, 13)]
+
+
+def test_chunked_ingest_types_the_table_and_keeps_the_triangles(agent, config, project, loss_table, triangle):
+    path = loss_table(n=3000)
+    name = project("Chunked", path, classes=("A", "B", ("AB", "A - B")))
+    requests = [dict(Path=p, DatasetName=d, Cumulative=c) for p in ("All", "AB") for d in ("Paid", "Inc")
+                for c in ("True", "False")]
+    config(table_cache=False)
+    expected = [triangle(name, **fields) for fields in requests]
+
+    agent._remove_table(agent._table_key(str(path)))
+    agent.RESULT_CACHE.clear()
+    config(table_cache=False, chunked_ingest=True, ingest_chunk_rows=700)
+    df = agent._get_df(name)
+    assert df["AccYM"].dtype == np.int32 and df["DevYM"].dtype == np.int32
+    assert isinstance(df["LOB"].dtype, pd.CategoricalDtype) and df["PaidLoss"].dtype == np.float64
+    assert len(df) == 3000
+
+    for fields, result in zip(requests, expected):
+        pd.testing.assert_frame_equal(triangle(name, **fields), result)
+
+
+def test_table_budget_evicts_the_least_recently_used(agent, config, project, loss_table):
+    names, keys = {}, {}
+    for seed, table in enumerate("XYZ"):
+        path = loss_table(seed=seed, name=f"{table}.csv")
+        names[table], keys[table] = project(f"Budget{table}", path), agent._table_key(str(path))
+
+    config(table_cache=False)
+    agent._get_df(names["X"])
+    budget = int(agent.DATA_DICT_LRU[keys["X"]] * 2.5)  # room for two tables
+    config(table_cache=False, table_cache_bytes=budget)
+    for table in "YXZ":  # X is used again after Y, so Y is evicted for Z
+        agent._get_df(names[table])
+    assert set(agent.DATA_DICT_LRU) == {keys["X"], keys["Z"]}
+    assert keys["Y"] not in agent.DATA_DICT
+
+    # A pinned project's table stays even when it is the least recently used
+    config(table_cache=False, table_cache_bytes=budget, pinned_projects=[names["X"]])
+    agent._get_df(names["Y"])
+    assert set(agent.DATA_DICT_LRU) == {keys["X"], keys["Y"]}
+
+
+def test_concurrent_requests_share_one_load_and_other_tables_stay_served(agent, config, project, loss_table,
+                                                                          monkeypatch):
+    config(table_cache=False)
+    slow = project("Slow", loss_table(seed=1, name="slow.csv"))
+    ready = project("Ready", loss_table(seed=2, name="ready.csv"))
+    agent._get_df(ready)
+
+    release, loads, timed_out = threading.Event(), [], []
+    load_to_DATA_DICT = agent.load_to_DATA_DICT
+
+    def slow_load(*args, **kwargs):
+        loads.append(args[0])
+        timed_out.append(not release.wait(5))
+        load_to_DATA_DICT(*args, **kwargs)
+
+    monkeypatch.setattr(agent, "load_to_DATA_DICT", slow_load)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(agent._get_df(slow))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    assert _wait_for(lambda: loads)
+
+    # A loaded table is served while another one loads
+    assert len(agent._get_df(ready)) == 2000
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert timed_out == [False]
+    assert len(loads) == 1 and len(results) == 4
+    assert all(df is results[0] for df in results)
@@ -0,0 +1,52 @@
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+from watchdog.events import FileDeletedEvent, FileModifiedEvent
+
+
+def test_versions_come_from_memory_until_the_file_changes(agent, tmp_path, monkeypatch):
+    stats = []
+    stat_version = agent.ChangeTracker._stat_version
+    counted = staticmethod(lambda p: stats.append(p) or stat_version(p))
+    monkeypatch.setattr(agent.ChangeTracker, "_stat_version", counted)
+    tracker = agent.ChangeTracker()
+    path = tmp_path / "settings.json"
+    path.write_text("{}")
+
+    version = tracker.version(path)
+    assert [tracker.version(path) for _ in range(3)] == [version] * 3
+    assert len(stats) == 1
+
+    path.write_text('{"changed": true}')
+    os.utime(path, ns=(0, version[0] + 10**9))
+    assert tracker.version(path) == version  # no event yet
+    tracker.on_any_event(FileModifiedEvent(str(path)))
+    assert tracker.version(path) == (version[0] + 10**9, path.stat().st_size)
+
+    # poll() catches changes on shares that drop events
+    path.unlink()
+    tracker.poll()
+    assert tracker.version(path) is None
+    path.write_text("{}")
+    tracker.on_any_event(FileDeletedEvent(str(tmp_path / "other.json")))
+    assert tracker.version(path) is None
+    tracker.refresh(path)
+    assert tracker.version(path) is not None
+
+
+def test_changed_dataset_types_reload_the_project(agent, config, project, loss_table, triangle):
+    config(table_cache=False)
+    name = project("Tracked", loss_table())
+    paid, inc = triangle(name, DatasetName="Paid"), triangle(name, DatasetName="Inc")
+
+    dataset_types = Path(agent.PROJECT_ROOT) / "projects" / name / "dataset_types.json"
+    types = json.loads(dataset_types.read_text())
+    types["rows"][0][1] = "IncLoss"  # Paid now reads the incurred column
+    dataset_types.write_text(json.dumps(types))
+    agent.CHANGE_TRACKER.refresh(dataset_types)
+    pd.testing.assert_frame_equal(triangle(name, DatasetName="Paid"), paid)  # not reloaded per request
+
+    agent.RequestHandler().refresh_vps(name)
+    pd.testing.assert_frame_equal(triangle(name, DatasetName="Paid"), inc)
@@ -0,0 +1,132 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+FORMULAS = [("Ratio", "PaidLoss / IncLoss", "Triangle"), ("Net", "PaidLoss - IncLoss", "Triangle")]
+
+
+def test_formula_datasets_share_one_cube(agent, config, project, loss_table, triangle, monkeypatch):
+    config(table_cache=False)
+    name = project("Cube", loss_table(), datasets=FORMULAS)
+    paid, inc = triangle(name, DatasetName="Paid"), triangle(name, DatasetName="Inc")
+
+    cubes = []
+    triangle_cube = agent._triangle_cube
+    monkeypatch.setattr(agent, "_triangle_cube", lambda *a: cubes.append(a[-1]) or triangle_cube(*a))
+    args = [agent.convert_dict({"Function": "ADASTri", "ProjectName": name, "Path": "All", "DatasetName": dataset,
+                                "Cumulative": "True", "OriginLength": "12", "DevelopmentLength": "12",
+                                "DataPath": "unused.csv", "UserName": "pytest"})
+            for dataset in ("Paid", "Ratio", "Net")]
+    group = agent._compute_ADASTri_group(args)
+
+    # One bucketing pass over the union of the datasets the formulas read
+    assert cubes == [["PaidLoss", "IncLoss"]]
+    pd.testing.assert_frame_equal(group[0], paid)
+    pd.testing.assert_frame_equal(group[1], paid / inc)
+    pd.testing.assert_frame_equal(group[2], paid - inc)
+
+
+def test_loss_cube_answers_like_the_table(agent, config, project, loss_table, triangle):
+    path = loss_table()
+    name = project("LossCube", path, classes=("A", "B", ("AB", "A - B")))
+    requests = [dict(Path=p, Cumulative=c, OriginLength=o, DevelopmentLength=d)
+                for p in ("All", "A", "AB") for c in ("True", "False") for o, d in (("12", "12"), ("3", "1"))]
+    config(table_cache=False)
+    expected = [triangle(name, **fields) for fields in requests]
+
+    key = agent._table_key(str(path))
+    agent._remove_table(key)
+    config(table_cache=False, loss_cube=True)
+    df = agent._get_df(name)  # the cube is built off-thread
+    for _ in range(100):
+        cube = agent._get_loss_cube(key, ["AccYM", "DevYM", "LOB"], ["PaidLoss"])
+        if cube is not None:
+            break
+        time.sleep(0.05)
+    assert cube is not None and len(cube) < len(df)
+
+    for fields, result in zip(requests, expected):
+        pd.testing.assert_frame_equal(triangle(name, **fields), result)
+
+
+def _clean_format_loop(n_origins, n_devs, org_len, dev_len, max_sys_month):
+    # The row-by-row Clean Format step the mask replaced
+    df2 = pd.DataFrame(np.ones((n_origins, n_devs)), columns=[f"d{j}" for j in range(n_devs)])
+    dev_label = list(df2.columns)
+    for i, acc in enumerate(df2.index):
+        max_dev_age = (n_origins - i) * int((org_len/dev_len))
+        if dev_len == 1:
+            max_dev_age = max_dev_age - (12 - max_sys_month)
+        if dev_len == 3:
+            if max_sys_month in [1, 2, 3]:
+                max_dev_age = max_dev_age - 3
+            elif max_sys_month in [4, 5, 6]:
+                max_dev_age = max_dev_age - 2
+            elif max_sys_month in [7, 8, 9]:
+                max_dev_age = max_dev_age - 1
+        if dev_len == 6 and max_sys_month <= 6:
+            max_dev_age = max_dev_age - 1
+        if max_dev_age < 0:
+            max_dev_age = 0
+        df2.loc[acc, dev_label[max_dev_age:]] = np.nan
+    return df2.isna().to_numpy()
+
+
+@pytest.mark.parametrize("org_len, dev_len", [(12, 12), (12, 6), (12, 3), (12, 1), (6, 6), (3, 3), (3, 1), (1, 1)])
+@pytest.mark.parametrize("max_sys_month", range(1, 13))
+def test_clean_format_mask_matches_the_loop(agent, org_len, dev_len, max_sys_month):
+    for n_origins, n_devs in [(5, 5), (8, 24), (20, 20), (1, 12)]:
+        mask = agent._clean_format_mask(n_origins, n_devs, org_len, dev_len, max_sys_month)
+        np.testing.assert_array_equal(mask, _clean_format_loop(n_origins, n_devs, org_len, dev_len, max_sys_month))
+        assert not mask.flags.writeable
+        assert agent._clean_format_mask(n_origins, n_devs, org_len, dev_len, max_sys_month) is mask
+
+
+SLICED = pd.DataFrame([[1.0, 2.0, 3.0], [4.0, 5.0, np.nan], [np.nan, np.nan, np.nan]], index=[2019, 2020, 2021])
+
+
+@pytest.mark.parametrize("index, expected", [(0, [3.0, 5.0, 0.0]), (-1, [2.0, 4.0, 0.0]), (-2, [1.0, 0.0, 0.0]),
+                                             (-5, [0.0, 0.0, 0.0]), (1, [3.0, 5.0, 0.0])])
+def test_triangle_diagonal_counts_back_from_the_last_value(agent, index, expected):
+    diagonal = agent._triangle_diagonal(SLICED, {"DiagonalIndex": index})
+    assert diagonal.index.tolist() == [2019, 2020, 2021]
+    assert diagonal["Diagonal"].tolist() == expected
+
+
+def test_triangle_cell_and_origin_are_one_based(agent):
+    assert agent._triangle_cell(SLICED, {"OriginPeriod": 2, "DevelopmentPeriod": 1}).to_numpy().tolist() == [[4.0]]
+    origin = agent._triangle_origin(SLICED, {"OriginPeriod": 1})
+    assert origin.to_numpy().tolist() == [[1.0, 2.0, 3.0]]
+    for arg in ({"OriginPeriod": 0, "DevelopmentPeriod": 1}, {"OriginPeriod": 1, "DevelopmentPeriod": 4}):
+        with pytest.raises(IndexError):
+            agent._triangle_cell(SLICED, arg)
+    with pytest.raises(IndexError):
+        agent._triangle_origin(SLICED, {"OriginPeriod": 4})
+
+
+def test_slices_reuse_the_cached_triangle(agent, project, loss_table, tmp_path, monkeypatch):
+    name = project("Slices", loss_table())
+    computed = []
+    compute = agent._compute_ADASTri
+    monkeypatch.setattr(agent, "_compute_ADASTri", lambda arg: computed.append(arg["Function"]) or compute(arg))
+
+    def request(out, **fields):
+        arg = {"Function": "ADASTri", "ProjectName": name, "Path": "All", "DatasetName": "Paid",
+               "Cumulative": "True", "OriginLength": "12", "DevelopmentLength": "12",
+               "DataPath": str(tmp_path / f"{out}.csv"), "UserName": "pytest"}
+        arg.update(fields)
+        agent.UDF_ADASTri(agent.convert_dict(arg))
+        return pd.read_csv(tmp_path / f"{out}.csv", header=None)
+
+    tri = request("tri")
+    diagonal = request("diag", Function="ADASTriDiag", DiagonalIndex="0")
+    cell = request("cell", Function="ADASTriCell", OriginPeriod="1", DevelopmentPeriod="1")
+    origin = request("origin", Function="ADASTriOrigin", OriginPeriod="2")
+
+    assert computed == ["ADASTri"]
+    assert diagonal.shape == (len(tri), 1)
+    assert diagonal.iloc[0, 0] == tri.iloc[0].dropna().iloc[-1]
+    assert cell.iloc[0, 0] == tri.iloc[0, 0]
+    pd.testing.assert_series_equal(origin.iloc[0], tri.iloc[1], check_names=False)
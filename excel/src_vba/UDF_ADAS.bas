@@ -63,22 +63,24 @@ Public Function ADASTriDiag( _
     Optional SuppressWarnings _
   ) As Variant
   
-    Dim tri() As Variant
-    Dim outArr() As Variant
+    Dim v As Variant
     
     On Error Resume Next
     
-    tri = ADASTri( _
-              Path, TriangleName, _
-              Cumulative, Transposed = 1, Calendar = 0, _
-              ProjectName, OriginLength, DevelopmentLength, _
-              ByTypeName, SuppressWarnings)
-    
-    outArr = GetDiagonal(tri, -DiagonalIndex)
+    ' The agent returns only the diagonal (one value per origin)
+    v = GetDataset( _
+        "Function = ADASTriDiag" & "#" & _
+        "Path = " & Path & "#" & _
+        "DatasetName = " & TriangleName & "#" & _
+        "DiagonalIndex = " & DiagonalIndex & "#" & _
+        "Cumulative = " & Cumulative & "#" & _
+        "ProjectName = " & SetDefaultProject(ProjectName) & "#" & _
+        "OriginLength = " & OriginLength & "#" & _
+        "DevelopmentLength = " & DevelopmentLength)
     
-    If Transposed Then outArr = TransposeArray(outArr)
+    If IsArray(v) And Transposed Then v = TransposeArray(v)
    
-    ADASTriDiag = outArr
+    ADASTriDiag = v
     
 End Function
 
@@ -93,16 +95,26 @@ Public Function ADASTriCell( _
     Optional SuppressWarnings _
 ) As Variant
 
-    Dim tri As Variant
+    Dim v As Variant
     On Error Resume Next
     
-    tri = ADASTri( _
-              Path, TriangleName, _
-              Cumulative, Transposed = False, Calendar = False, _
-              ProjectName, OriginLength, DevelopmentLength, _
-              ByTypeName, SuppressWarnings)
+    ' The agent returns only the requested cell
+    v = GetDataset( _
+        "Function = ADASTriCell" & "#" & _
+        "Path = " & Path & "#" & _
+        "DatasetName = " & TriangleName & "#" & _
+        "OriginPeriod = " & OriginPeriod & "#" & _
+        "DevelopmentPeriod = " & DevelopmentPeriod & "#" & _
+        "Cumulative = " & Cumulative & "#" & _
+        "ProjectName = " & SetDefaultProject(ProjectName) & "#" & _
+        "OriginLength = " & OriginLength & "#" & _
+        "DevelopmentLength = " & DevelopmentLength)
     
-    ADASTriCell = tri(DevelopmentPeriod, OriginPeriod)
+    If IsArray(v) Then
+        ADASTriCell = v(LBound(v, 1), LBound(v, 2))
+    Else
+        ADASTriCell = v
+    End If
     
 End Function
 
@@ -148,39 +160,24 @@ Public Function ADASTriOrigin( _
     Optional SuppressWarnings _
 ) As Variant
 
-    Dim tri As Variant
-    Dim outArr() As Variant
-    Dim lb1 As Long, ub1 As Long
-    Dim lb2 As Long, ub2 As Long
-    Dim r As Long, c As Long
+    Dim v As Variant
     On Error Resume Next
     
-    tri = ADASTri( _
-            Path, TriangleName, _
-            Cumulative, 0, Calendar, _
-            ProjectName, OriginLength, DevelopmentLength, _
-            ByTypeName, SuppressWarnings)
-
-    lb1 = LBound(tri, 1)
-    ub1 = UBound(tri, 1)
-    lb2 = LBound(tri, 2)
-    ub2 = UBound(tri, 2)
-
-    If lb1 = 0 Then
-        r = OriginPeriod - 1
-    Else
-        r = OriginPeriod
-    End If
-
-    ReDim outArr(1 To 1, 1 To ub2 - lb2 + 1)
-    For c = lb2 To ub2
-        outArr(1, c - lb2 + 1) = tri(r, c)
-    Next c
+    ' The agent returns only the requested origin row
+    v = GetDataset( _
+        "Function = ADASTriOrigin" & "#" & _
+        "Path = " & Path & "#" & _
+        "DatasetName = " & TriangleName & "#" & _
+        "OriginPeriod = " & OriginPeriod & "#" & _
+        "Cumulative = " & Cumulative & "#" & _
+        "ProjectName = " & SetDefaultProject(ProjectName) & "#" & _
+        "OriginLength = " & OriginLength & "#" & _
+        "DevelopmentLength = " & DevelopmentLength)
 
-    If Transposed Then
-        ADASTriOrigin = TransposeArray(outArr)
+    If IsArray(v) And Transposed Then
+        ADASTriOrigin = TransposeArray(v)
     Else
-        ADASTriOrigin = outArr
+        ADASTriOrigin = v
     End If
     
 End Function
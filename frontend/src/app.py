@@ -16,7 +16,12 @@ from fastapi.responses import RedirectResponse
 from pathlib import Path
 
 import time
+import glob
+import socket
+import struct
 import hashlib
+import urllib.error
+import urllib.request
 from datetime import datetime
 from typing import TYPE_CHECKING
 
@@ -70,6 +75,10 @@ def _get_requests_dir() -> str:
     config = load_ui_config()
     return get_path(config.get("paths", {}).get("requests", "requests"))
 
+def _get_agent_instances_dir() -> str:
+    config = load_ui_config()
+    return get_path(config.get("paths", {}).get("agent_instances", os.path.join("core", "ADAS Agent", "instances")))
+
 # Legacy compatibility - these will use the dynamic functions
 DATA_DIR = os.environ.get("TRI_DATA_DIR") or _get_data_dir()
 DATASETS = {
@@ -149,6 +158,10 @@ def send_request_like_vba(request_info: str) -> str:
     - write temp .tmp then atomically publish to .txt
     - filename uses yyyy-mm-dd_hh-mm-ss.000 (ms)
     """
+    lines = request_info.split("#") + [f"UserName = {os.environ.get('USERNAME', '')}"]
+    return _publish_request_file(lines)
+
+def _publish_request_file(lines: List[str]) -> str:
     os.makedirs(REQUEST_DIR, exist_ok=True)
 
     # VBA: Format(Now, "yyyy-mm-dd_hh-mm-ss") & Format(Timer - Int(Timer), ".000")
@@ -159,12 +172,9 @@ def send_request_like_vba(request_info: str) -> str:
     temp_path = os.path.join(REQUEST_DIR, f"request-{current_time}.tmp")
     final_path = os.path.join(REQUEST_DIR, f"request-{current_time}.txt")
 
-    lines = request_info.split("#")
-
     with open(temp_path, "w", encoding="utf-8", newline="\n") as f:
         for line in lines:
             f.write(line.rstrip("\r\n") + "\n")
-        f.write(f"UserName = {os.environ.get('USERNAME', '')}\n")
 
     # overwrite protection (same as your VBA logic)
     if os.path.exists(final_path):
@@ -180,6 +190,64 @@ def send_request_like_vba(request_info: str) -> str:
     os.replace(temp_path, final_path)
     return final_path
 
+BATCH_SEPARATOR = "---"  # must match the agent's BATCH_SEPARATOR
+
+def send_batch_like_vba(request_infos: List[str]) -> str:
+    """
+    Submit several requests as one batch request file (one create / watch event / read
+    for the agent instead of one per call). Each request_info is "key = value#..." as for
+    send_request_like_vba; each call starts with a BATCH_SEPARATOR line and the shared
+    UserName goes before the first one. The agent writes each call's own DataPath.
+    """
+    lines = [f"UserName = {os.environ.get('USERNAME', '')}"]
+    for request_info in request_infos:
+        lines.append(BATCH_SEPARATOR)
+        lines.extend(request_info.split("#"))
+    return _publish_request_file(lines)
+
+def _local_agent_ports() -> List[tuple[int, str]]:
+    """
+    RPC (port, token) of the agents running on this machine, most recently seen first.
+    Each agent publishes 'RPC Port' and 'RPC Token' in its instance file (<COMPUTERNAME>@<user>@<ts>.txt).
+    """
+    device = os.environ.get("COMPUTERNAME", "")
+    agents = []
+    for path in glob.glob(os.path.join(_get_agent_instances_dir(), f"{glob.escape(device)}@*.txt")):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                info = dict(line.split(" = ", 1) for line in f.read().splitlines() if " = " in line)
+            agents.append((info.get("Last seen", ""), int(info["RPC Port"]), info["RPC Token"]))
+        except (OSError, KeyError, ValueError):
+            continue
+    return [(port, token) for _, port, token in sorted(agents, reverse=True)]
+
+def send_request_rpc(pairs: list[tuple[str, str]], data_path: str, timeout_sec: float) -> Optional[bytes]:
+    """
+    Send a request straight to a local agent (see _local_agent_ports) and return its output.
+    Returns None when no agent answers, so the caller can fall back to send_request_like_vba.
+    Raises TimeoutError when an agent took the request but did not finish in time.
+    """
+    arg = {k: v for k, v in pairs}
+    arg["DataPath"] = data_path
+    arg["UserName"] = os.environ.get("USERNAME", "")
+    body = json.dumps(arg).encode("utf-8")
+
+    for port, token in _local_agent_ports():
+        req = urllib.request.Request(
+            f"http://127.0.0.1:{port}/request",
+            data=body,
+            headers={"Content-Type": "application/json", "X-ADAS-Token": token},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=timeout_sec) as resp:
+                return resp.read()
+        except (socket.timeout, TimeoutError):
+            raise TimeoutError(f"Agent on port {port} did not answer in {timeout_sec}s")
+        except (urllib.error.URLError, OSError):
+            continue  # agent gone or failed: try the next one
+    return None
+
 def wait_for_file(path: str, timeout_sec: float) -> bool:
     """
     Wait until file exists.
@@ -285,11 +353,47 @@ def make_annual_labels(start_year: int, n_origin: int, n_dev: int) -> Tuple[List
     dev_labels = [str(12 * (j + 1)) for j in range(n_dev)]
     return origin_labels, dev_labels
 
+TRIANGLE_BINARY_MAGIC = b"ADASTRI1"
+
+def triangle_binary_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".tri"
+
+def read_triangle_binary(path: str, with_values: bool = True) -> Optional[Tuple[Dict[str, Any], Optional[np.ndarray]]]:
+    """
+    Read the binary form the agent writes next to a result CSV (<name>.tri):
+    8-byte magic, uint32 header length, JSON header {"shape", "index", "columns"},
+    then row-major little-endian float64 values.
+    Returns None when there is no binary form, or it is older than the CSV (e.g. patched).
+    """
+    bin_path = triangle_binary_path(path)
+    try:
+        if os.stat(bin_path).st_mtime < os.stat(path).st_mtime:
+            return None
+        with open(bin_path, "rb") as f:
+            if f.read(len(TRIANGLE_BINARY_MAGIC)) != TRIANGLE_BINARY_MAGIC:
+                return None
+            (header_len,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_len).decode("utf-8"))
+            if not with_values:
+                return header, None
+            n_origin, n_dev = header["shape"]
+            values = np.fromfile(f, dtype="<f8", count=n_origin * n_dev).reshape(n_origin, n_dev)
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+    return header, values
+
 def infer_shape(path: str) -> Tuple[int, int]:
+    binary = read_triangle_binary(path, with_values=False)
+    if binary is not None:
+        n_origin, n_dev = binary[0]["shape"]
+        return int(n_origin), int(n_dev)
     df = pd.read_csv(path, header=None)
     return int(df.shape[0]), int(df.shape[1])
 
 def load_triangle_values(path: str) -> pd.DataFrame:
+    binary = read_triangle_binary(path)
+    if binary is not None:
+        return pd.DataFrame(binary[1])
     return pd.read_csv(path, header=None, dtype="float64")
 
 def triangle_mask(n_origin: int, n_dev: int) -> np.ndarray:
@@ -388,6 +492,11 @@ class AdaTriRequest(BaseModel):
     timeout_sec: float = 6.0
 
 
+class AdaTriBatchRequest(BaseModel):
+    items: List[AdaTriRequest]
+    timeout_sec: float = 6.0
+
+
 class AdaHeadersRequest(BaseModel):
     periodType: int = 0
     Transposed: bool = False
@@ -411,23 +520,34 @@ def adas_headers(req: AdaHeadersRequest) -> Dict[str, Any]:
 
     data_path = set_data_path_like_vba(pairs)
     request_file = None  # <-- add
+    raw = None
 
     if not os.path.exists(data_path):
-        request_info = "#".join([f"{k} = {v}" for k, v in pairs] + [f"DataPath = {data_path}"])
-        request_file = send_request_like_vba(request_info)
+        # Prefer a local agent's RPC endpoint; fall back to the request file protocol
+        try:
+            output = send_request_rpc(pairs, data_path, timeout_sec=max(0.1, float(req.timeout_sec)))
+        except TimeoutError:
+            return {"ok": False, "status": "timeout", "request_file": None, "data_path": data_path}
 
-        ok = wait_for_file(data_path, timeout_sec=max(0.1, float(req.timeout_sec)))
-        if not ok:
-            return {
-                "ok": False,
-                "status": "timeout",
-                "request_file": request_file,
-                "data_path": data_path,
-            }
+        if output is not None:
+            raw = output.decode("utf-8").strip()
+        else:
+            request_info = "#".join([f"{k} = {v}" for k, v in pairs] + [f"DataPath = {data_path}"])
+            request_file = send_request_like_vba(request_info)
+
+            ok = wait_for_file(data_path, timeout_sec=max(0.1, float(req.timeout_sec)))
+            if not ok:
+                return {
+                    "ok": False,
+                    "status": "timeout",
+                    "request_file": request_file,
+                    "data_path": data_path,
+                }
 
     # Read single-row CSV: "2016,2017,..."
-    with open(data_path, "r", encoding="utf-8") as f:
-        raw = f.read().strip()
+    if raw is None:
+        with open(data_path, "r", encoding="utf-8") as f:
+            raw = f.read().strip()
 
     # robust parse: allow commas + newlines
     parts = [x.strip() for x in raw.replace("\n", ",").split(",") if x.strip()]
@@ -474,11 +594,10 @@ def adas_projects() -> Dict[str, Any]:
 
     return {"sheet": first_sheet, "projects": out}
 
-@app.post("/adas/tri")
-def adas_tri(req: AdaTriRequest) -> Dict[str, Any]:
+def _adas_tri_pairs(req: AdaTriRequest) -> list[tuple[str, str]]:
     # NOTE:
     # exactly what ADASTri passes into SetDataPath.
-    pairs = [
+    return [
         ("Function", "ADASTri"),
         ("Path", req.Path),
         ("DatasetName", req.TriangleName),
@@ -490,15 +609,33 @@ def adas_tri(req: AdaTriRequest) -> Dict[str, Any]:
         ("DevelopmentLength", str(req.DevelopmentLength)),
     ]
 
+def _register_tri_dataset(data_path: str) -> str:
+    # Register dataset id deterministically from the datapath
+    ds_id = "adastri_" + hashlib.sha1(data_path.encode("utf-8")).hexdigest()[:16]
+    DATASETS[ds_id] = data_path  # reuse existing /dataset/{ds_id}
+    return ds_id
+
+@app.post("/adas/tri")
+def adas_tri(req: AdaTriRequest) -> Dict[str, Any]:
+    pairs = _adas_tri_pairs(req)
     data_path = set_data_path_like_vba(pairs)
     request_file = None  # <-- add
 
     if not os.path.exists(data_path):
-        # Build requestInfo text (what your agent expects)
-        request_info = "#".join([f"{k} = {v}" for k, v in pairs] + [f"DataPath = {data_path}"])
-        request_file = send_request_like_vba(request_info)
+        # Prefer a local agent's RPC endpoint (it writes data_path before answering)
+        try:
+            output = send_request_rpc(pairs, data_path, timeout_sec=max(0.1, float(req.timeout_sec)))
+        except TimeoutError:
+            return {"ok": False, "status": "timeout", "request_file": None, "data_path": data_path}
 
-        ok = wait_for_file(data_path, timeout_sec=max(0.1, float(req.timeout_sec)))
+        if output is not None:
+            ok = True
+        else:
+            # Build requestInfo text (what your agent expects); the agent writes the .tri only when asked
+            request_info = "#".join([f"{k} = {v}" for k, v in pairs] + [f"DataPath = {data_path}", "BinaryOutput = True"])
+            request_file = send_request_like_vba(request_info)
+
+            ok = wait_for_file(data_path, timeout_sec=max(0.1, float(req.timeout_sec)))
         if not ok:
             # Let UI decide whether to keep waiting or show timeout
             return {
@@ -508,17 +645,43 @@ def adas_tri(req: AdaTriRequest) -> Dict[str, Any]:
                 "data_path": data_path,
             }
 
-    # Register dataset id deterministically from the datapath
-    ds_id = "adastri_" + hashlib.sha1(data_path.encode("utf-8")).hexdigest()[:16]
-    DATASETS[ds_id] = data_path  # reuse existing /dataset/{ds_id}
-
     return {
         "ok": True,
-        "ds_id": ds_id,
+        "ds_id": _register_tri_dataset(data_path),
         "request_file": request_file,
         "data_path": data_path,
     }
 
+@app.post("/adas/tri/batch")
+def adas_tri_batch(req: AdaTriBatchRequest) -> Dict[str, Any]:
+    """
+    Several ADASTri requests at once: the missing ones go to the agent as one batch
+    request file, then every data path is awaited within the shared timeout.
+    """
+    items = [(_adas_tri_pairs(item), item) for item in req.items]
+    data_paths = [set_data_path_like_vba(pairs) for pairs, _ in items]
+
+    pending = {}
+    for (pairs, _), data_path in zip(items, data_paths):
+        if not os.path.exists(data_path):
+            pending[data_path] = "#".join([f"{k} = {v}" for k, v in pairs] + [f"DataPath = {data_path}", "BinaryOutput = True"])
+
+    request_file = send_batch_like_vba(list(pending.values())) if pending else None
+
+    deadline = time.time() + max(0.1, float(req.timeout_sec))
+    results = []
+    for data_path in data_paths:
+        if wait_for_file(data_path, timeout_sec=max(0.0, deadline - time.time())):
+            results.append({"ok": True, "ds_id": _register_tri_dataset(data_path), "data_path": data_path})
+        else:
+            results.append({"ok": False, "status": "timeout", "data_path": data_path})
+
+    return {
+        "ok": all(r["ok"] for r in results),
+        "results": results,
+        "request_file": request_file,
+    }
+
 @app.post("/book/meta")
 def book_meta(req: AnyBookSheetRequest) -> Dict[str, Any]:
     book = resolve_allowed_book(req.book_path)
@@ -588,7 +751,7 @@ def get_dataset(ds_id: str, start_year: int = 2016) -> Dict[str, Any]:
     if not path or not os.path.exists(path):
         raise HTTPException(404, f"Unknown dataset: {ds_id}")
 
-    df = pd.read_csv(path, header=None, dtype="float64", keep_default_na=True)
+    df = load_triangle_values(path)
     n_origin, n_dev = df.shape
 
     origin_labels = [str(start_year + i) for i in range(n_origin)]
@@ -661,6 +824,10 @@ def patch_dataset(ds_id: str, req: PatchRequest) -> Dict[str, Any]:
         applied += 1
 
     atomic_write_csv(df, path)
+    try:
+        os.remove(triangle_binary_path(path))  # now stale; readers fall back to the CSV
+    except OSError:
+        pass
     st2 = os.stat(path)
 
     return {"ok": True, "applied": applied, "rejected": rejected, "mtime": st2.st_mtime}